@@ -0,0 +1,301 @@
+0: jal x7, .+4
+4: xor x7, x7, x7
+8: andi x5, x7, 124
+12: sw x6, 48(x5)
+16: andi x5, x7, -1824
+20: ori x4, x5, -701
+24: xori x2, x5, -626
+28: and x3, x3, x0
+32: andi x6, x2, 124
+36: lw x7, 44(x6)
+40: jal x2, .+16
+44: andi x4, x4, 124
+48: lw x4, 60(x4)
+52: ori x6, x0, 825
+56: andi x4, x6, -688
+60: bne x0, x4, .+20
+64: andi x3, x0, 955
+68: beq x6, x4, .+24
+72: and x6, x3, x6
+76: andi x2, x4, 124
+80: sw x6, 24(x2)
+84: andi x1, x4, 124
+88: sw x4, 28(x1)
+92: add x3, x4, x1
+96: addi x7, x3, -1751
+100: and x6, x2, x3
+104: or x5, x1, x7
+108: beq x7, x5, .+12
+112: andi x1, x7, 124
+116: lw x3, 48(x1)
+120: xor x3, x5, x3
+124: andi x3, x5, 124
+128: lw x6, 20(x3)
+132: add x2, x3, x3
+136: ori x3, x5, -2009
+140: or x4, x3, x4
+144: add x2, x2, x4
+148: andi x4, x2, 124
+152: lw x7, 48(x4)
+156: jal x6, .+16
+160: addi x5, x7, -564
+164: bne x5, x2, .+20
+168: ori x3, x5, 1329
+172: xor x2, x1, x1
+176: andi x4, x2, -1444
+180: add x3, x4, x2
+184: and x3, x4, x4
+188: addi x3, x4, 692
+192: andi x2, x1, 124
+196: sw x0, 60(x2)
+200: or x2, x5, x3
+204: andi x6, x0, 124
+208: lw x2, 36(x6)
+212: ori x5, x2, -1358
+216: addi x1, x5, -848
+220: andi x1, x1, 124
+224: sw x1, 16(x1)
+228: andi x6, x2, 124
+232: lw x5, 36(x6)
+236: jal x7, .+16
+240: and x2, x5, x1
+244: xori x4, x6, -863
+248: addi x7, x4, -570
+252: addi x4, x4, 1328
+256: andi x4, x4, 124
+260: sw x2, 40(x4)
+264: andi x7, x4, 124
+268: sw x4, 48(x7)
+272: bne x4, x0, .+24
+276: add x1, x4, x7
+280: beq x1, x4, .+12
+284: andi x5, x4, 124
+288: lw x6, 16(x5)
+292: ori x5, x1, -369
+296: jal x7, .+4
+300: andi x5, x2, 1925
+304: bne x5, x5, .+20
+308: andi x2, x7, 124
+312: sw x3, 32(x2)
+316: or x4, x5, x7
+320: addi x3, x5, 1579
+324: xor x4, x0, x5
+328: xor x3, x3, x7
+332: addi x5, x7, -823
+336: andi x6, x4, 124
+340: sw x5, 28(x6)
+344: add x1, x7, x4
+348: add x3, x3, x5
+352: xori x6, x3, -280
+356: bne x1, x6, .+12
+360: sub x7, x3, x7
+364: ori x3, x6, 1224
+368: andi x7, x5, 124
+372: lw x4, 8(x7)
+376: ori x3, x7, -521
+380: or x2, x2, x4
+384: or x1, x4, x7
+388: andi x6, x6, 543
+392: or x1, x4, x2
+396: ori x1, x1, -82
+400: andi x1, x1, 124
+404: sw x6, 4(x1)
+408: ori x2, x1, -1095
+412: and x4, x1, x1
+416: ori x5, x2, 2012
+420: jal x7, .+24
+424: andi x4, x4, -1162
+428: xori x1, x3, -1415
+432: andi x7, x5, -1180
+436: andi x2, x4, 124
+440: sw x7, 52(x2)
+444: andi x2, x4, -1800
+448: and x5, x1, x1
+452: andi x5, x5, 124
+456: lw x4, 28(x5)
+460: and x1, x5, x2
+464: andi x6, x1, 124
+468: sw x3, 48(x6)
+472: xori x6, x3, 1042
+476: xor x4, x4, x1
+480: andi x5, x6, 124
+484: lw x4, 36(x5)
+488: jal x2, .+16
+492: andi x6, x4, 124
+496: sw x4, 0(x6)
+500: and x1, x1, x0
+504: xori x7, x2, -1736
+508: andi x1, x7, 124
+512: sw x7, 20(x1)
+516: bne x4, x1, .+24
+520: andi x7, x2, 124
+524: sw x1, 52(x7)
+528: addi x6, x5, -1919
+532: xor x3, x7, x6
+536: beq x7, x0, .+16
+540: jal x4, .+16
+544: andi x5, x3, 124
+548: lw x4, 56(x5)
+552: bne x3, x4, .+16
+556: and x6, x3, x5
+560: bne x4, x4, .+4
+564: xor x7, x6, x2
+568: addi x3, x4, -310
+572: and x7, x6, x0
+576: beq x7, x3, .+8
+580: xor x5, x7, x7
+584: andi x5, x5, 124
+588: lw x5, 28(x5)
+592: andi x7, x5, 124
+596: lw x4, 48(x7)
+600: sub x2, x4, x2
+604: andi x5, x1, 124
+608: sw x2, 48(x5)
+612: xor x5, x4, x2
+616: xori x3, x2, -1706
+620: sub x2, x3, x2
+624: andi x7, x2, 124
+628: sw x2, 8(x7)
+632: xor x5, x0, x2
+636: ori x6, x6, -1172
+640: andi x3, x6, 124
+644: sw x3, 32(x3)
+648: xor x4, x1, x6
+652: andi x7, x7, 124
+656: lw x7, 52(x7)
+660: and x1, x7, x3
+664: add x2, x4, x7
+668: and x1, x2, x7
+672: andi x1, x2, 124
+676: lw x5, 28(x1)
+680: jal x4, .+16
+684: beq x1, x5, .+4
+688: jal x5, .+8
+692: andi x4, x5, 1605
+696: and x2, x3, x4
+700: sub x6, x2, x4
+704: xori x4, x4, 845
+708: andi x1, x1, 124
+712: lw x7, 52(x1)
+716: and x4, x7, x4
+720: andi x3, x4, 124
+724: sw x4, 56(x3)
+728: xor x7, x4, x4
+732: andi x6, x7, 124
+736: lw x4, 12(x6)
+740: andi x4, x4, 124
+744: lw x7, 48(x4)
+748: andi x6, x7, 124
+752: lw x2, 44(x6)
+756: andi x6, x7, 124
+760: sw x3, 60(x6)
+764: ori x5, x5, 119
+768: andi x6, x5, 124
+772: lw x1, 4(x6)
+776: xor x3, x7, x5
+780: andi x5, x1, 124
+784: lw x1, 28(x5)
+788: andi x3, x3, 124
+792: sw x3, 16(x3)
+796: addi x4, x4, -222
+800: andi x3, x1, 124
+804: lw x6, 48(x3)
+808: ori x1, x6, 958
+812: xor x7, x4, x1
+816: andi x2, x1, 124
+820: lw x3, 28(x2)
+824: xori x1, x7, 915
+828: andi x6, x1, 124
+832: sw x3, 20(x6)
+836: beq x7, x1, .+8
+840: andi x3, x7, 124
+844: lw x1, 0(x3)
+848: and x3, x3, x1
+852: or x6, x1, x2
+856: bne x1, x6, .+8
+860: sub x2, x3, x1
+864: andi x4, x3, 124
+868: sw x6, 28(x4)
+872: andi x6, x3, 124
+876: sw x6, 16(x6)
+880: add x3, x3, x6
+884: andi x2, x6, 124
+888: lw x2, 0(x2)
+892: andi x7, x2, 124
+896: sw x3, 16(x7)
+900: andi x4, x5, 124
+904: sw x2, 8(x4)
+908: add x2, x2, x3
+912: andi x6, x3, 124
+916: sw x2, 8(x6)
+920: andi x2, x2, 124
+924: sw x2, 20(x2)
+928: andi x7, x7, 124
+932: sw x3, 60(x7)
+936: addi x6, x3, 1048
+940: sub x6, x6, x2
+944: and x6, x4, x2
+948: ori x2, x6, 1682
+952: andi x4, x6, 124
+956: lw x4, 4(x4)
+960: add x6, x6, x2
+964: addi x2, x2, -643
+968: addi x6, x6, 1749
+972: or x1, x1, x6
+976: or x7, x2, x6
+980: andi x5, x7, 124
+984: lw x4, 36(x5)
+988: andi x7, x7, -630
+992: andi x4, x7, 124
+996: lw x5, 56(x4)
+1000: andi x5, x4, 124
+1004: sw x0, 32(x5)
+1008: andi x7, x0, 124
+1012: lw x2, 32(x7)
+1016: addi x6, x7, 1502
+1020: and x2, x5, x5
+1024: andi x2, x2, 124
+1028: sw x2, 44(x2)
+1032: and x1, x5, x2
+1036: andi x7, x6, 124
+1040: lw x3, 28(x7)
+1044: ori x2, x3, 1231
+1048: addi x1, x4, 605
+1052: beq x3, x3, .+12
+1056: or x3, x5, x2
+1060: sub x2, x3, x1
+1064: andi x3, x1, 124
+1068: lw x7, 4(x3)
+1072: and x5, x3, x7
+1076: andi x7, x7, 124
+1080: lw x1, 40(x7)
+1084: add x6, x1, x7
+1088: add x1, x1, x5
+1092: sub x4, x1, x7
+1096: addi x5, x6, -60
+1100: sub x6, x1, x1
+1104: xori x3, x4, -367
+1108: andi x5, x4, 124
+1112: lw x6, 12(x5)
+1116: sub x4, x6, x6
+1120: xor x3, x6, x1
+1124: andi x1, x3, 124
+1128: lw x5, 44(x1)
+1132: andi x6, x3, -141
+1136: beq x3, x0, .+4
+1140: sub x4, x6, x3
+1144: xor x3, x5, x6
+1148: andi x1, x1, 124
+1152: lw x3, 0(x1)
+1156: or x5, x4, x4
+1160: add x4, x5, x7
+1164: andi x1, x1, 124
+1168: lw x7, 20(x1)
+1172: beq x7, x7, .+12
+1176: sub x7, x5, x2
+1180: add x1, x0, x7
+1184: beq x4, x6, .+16
+1188: xor x7, x2, x7
+1192: xor x7, x7, x7
+1196: xor x4, x1, x7
+1200: HALT
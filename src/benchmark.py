@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from riscvmodel import insn
+
+from models import InsMem, DataMem, read_image
+from pipeline_config import PipelineConfig
+from rv32i_simulator import SingleStageCore, FiveStageCore
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_CASES = os.path.join(SRC_DIR, "..", "test_cases")
+BENCHMARKS = os.path.join(SRC_DIR, "..", "benchmarks")
+CORES = {"SS": SingleStageCore, "FS": FiveStageCore}
+# throughput metrics of a workload regress when they drop, peak RSS when it grows - startup time is checked apart
+HIGHER_IS_BETTER = ["cycles_per_sec", "instructions_per_sec"]
+LOWER_IS_BETTER = ["peak_rss_kb"]
+
+
+def image(directory: str):
+    def workload():
+        return read_image(os.path.join(directory, "imem.txt")), read_image(os.path.join(directory, "dmem.txt"))
+    return workload
+
+
+def test_case(number: int):
+    return image(os.path.join(TEST_CASES, f"TC{number}"))
+
+
+def counted_loop():
+    # steady state - 2000 iterations of a four instruction loop body
+    program = [insn.InstructionADDI(1, 0, 2000), insn.InstructionADDI(2, 2, 1), insn.InstructionADD(3, 3, 2),
+               insn.InstructionSW(0, 3, 0), insn.InstructionBNE(2, 1, -12)]
+    return [instruction.encode() for instruction in program] + [0xffffffff], []
+
+
+# fixed set - changing it invalidates the history and baselines
+WORKLOADS = {
+    "TC0": test_case(0), "TC1": test_case(1), "TC2": test_case(2), "TC3": test_case(3), "TC4": test_case(4),
+    "loop": counted_loop,
+    # hazard-dense code with forward branches - fuzzer seed 2, 300 instructions, frozen so fuzzer changes leave it be
+    "random": image(os.path.join(BENCHMARKS, "random"))
+}
+# workloads assembled with the RV32I encodings - funct3 000 loads are LB, so they run with legacy_lw off
+RV32I_WORKLOADS = ["loop", "random"]
+
+
+def workload_config(workload: str) -> PipelineConfig:
+    return PipelineConfig(legacy_lw=workload not in RV32I_WORKLOADS)
+
+
+def measure(workload: str, core: str, min_time: float, rounds: int) -> dict:
+    # best of `rounds` - each round reruns the workload on fresh cores until min_time has passed
+    program, data = WORKLOADS[workload]()
+    config = workload_config(workload)
+    best = None
+    for _ in range(rounds):
+        cycles = instructions = 0
+        elapsed = 0.0
+        while elapsed < min_time:
+            sim = CORES[core]("", InsMem("Imem", "", image=program), DataMem(core, "", image=data), trace=False,
+                               config=config)
+            start = time.perf_counter()
+            while not sim.halted:
+                sim.step()
+            elapsed += time.perf_counter() - start
+            cycles += sim.cycle
+            instructions += sim.state.IF.instruction_count
+        if best is None or cycles / elapsed > best["cycles_per_sec"]:
+            best = {"cycles_per_sec": cycles / elapsed, "instructions_per_sec": instructions / elapsed}
+    best["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return best
+
+
+def run_isolated(workload: str, core: str, min_time: float, rounds: int) -> dict:
+    # every measurement in a fresh interpreter - peak RSS belongs to the workload alone
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", workload, core,
+                             "--min-time", str(min_time), "--rounds", str(rounds)],
+                            cwd=SRC_DIR, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def startup_time(rounds: int) -> float:
+    # interpreter start plus simulator imports, best of rounds
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main, simulator"], cwd=SRC_DIR, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=SRC_DIR, check=True, capture_output=True,
+                                text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=SRC_DIR, check=True,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def run_benchmark(min_time: float, rounds: int) -> dict:
+    results = {}
+    for workload in WORKLOADS:
+        for core in CORES:
+            results[f"{workload}/{core}"] = run_isolated(workload, core, min_time, rounds)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "startup_sec": startup_time(rounds),
+        "results": results
+    }
+
+
+def compare(run: dict, baseline: dict, tolerance: float) -> list:
+    # regressions of run against baseline - [(metric, baseline value, current value)]
+    regressions = []
+    if run["startup_sec"] > baseline["startup_sec"] * (1 + tolerance):
+        regressions.append(("startup_sec", baseline["startup_sec"], run["startup_sec"]))
+    for name, base in baseline["results"].items():
+        if name not in run["results"]:
+            continue
+        current = run["results"][name]
+        for metric in HIGHER_IS_BETTER:
+            if current[metric] < base[metric] * (1 - tolerance):
+                regressions.append((f"{name} {metric}", base[metric], current[metric]))
+        for metric in LOWER_IS_BETTER:
+            if metric in base and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append((f"{name} {metric}", base[metric], current[metric]))
+    return regressions
+
+
+def append_history(path: str, run: dict):
+    history = []
+    if os.path.exists(path):
+        with open(path) as file:
+            history = json.load(file)
+    history.append(run)
+    with open(path, "w") as file:
+        json.dump(history, file, indent=2)
+
+
+def format_run(run: dict) -> list:
+    op = [f"Benchmark {run['commit']} - startup {run['startup_sec'] * 1000:.1f} ms\n",
+          f"{'workload':<12} {'cycles/s':>10} {'instr/s':>10} {'peak RSS KB':>12}\n"]
+    for name, result in run["results"].items():
+        op.append(f"{name:<12} {result['cycles_per_sec']:>10.0f} {result['instructions_per_sec']:>10.0f} "
+                  f"{result['peak_rss_kb']:>12}\n")
+    return op
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RV32I simulator performance regression check')
+    parser.add_argument("--history", default="benchmark_history.json", type=str,
+                        help="JSON history file every run is appended to.")
+    parser.add_argument("--baseline", default="", type=str, help="Baseline run to compare against.")
+    parser.add_argument("--save-baseline", default="", type=str, help="Write this run as the new baseline.")
+    parser.add_argument("--tolerance", default=0.1, type=float, help="Allowed relative regression, 0.1 - 10%%.")
+    parser.add_argument("--min-time", default=0.2, type=float, help="Seconds every measurement round runs at least.")
+    parser.add_argument("--rounds", default=3, type=int, help="Rounds per measurement - the best one is kept.")
+    parser.add_argument("--measure", nargs=2, metavar=("WORKLOAD", "CORE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.min_time, args.rounds)))
+        return
+
+    run = run_benchmark(args.min_time, args.rounds)
+    sys.stdout.writelines(format_run(run))
+    append_history(args.history, run)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(run, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(run, baseline, args.tolerance)
+        for metric, base, current in regressions:
+            print(f"Regression - {metric}: {base:.6g} -> {current:.6g}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression against {baseline['commit']} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
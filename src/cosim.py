@@ -0,0 +1,98 @@
+from collections import deque
+
+from riscvmodel.code import decode
+
+from rv32i_simulator import SingleStageCore, FiveStageCore
+
+
+class Commit(object):
+    # architectural effect of one retiring instruction
+
+    def __init__(self, pc: int, instruction, target: str, value: int):
+        self.pc = pc
+        self.instruction = instruction
+        self.target = target  # x<rd> / DMem[<address>]
+        self.value = value
+
+    def matches(self, other) -> bool:
+        return other is not None and self.target == other.target and self.value == other.value
+
+    def __str__(self):
+        return f"PC {self.pc} {self.instruction}: {self.target} = {self.value}"
+
+
+class CosimMismatch(Exception):
+
+    def __init__(self, cycle: int, ss_commit: Commit, fs_commit: Commit):
+        self.cycle = cycle
+        self.ss_commit = ss_commit
+        self.fs_commit = fs_commit
+        super(CosimMismatch, self).__init__(f"FS cycle {cycle} - SS: {ss_commit or 'nothing retired'}, "
+                                            f"FS: {fs_commit or 'nothing retired'}")
+
+
+class CommitLog(object):
+    # wraps write_rf / write_data_mem of a core instance - cores which are not co-simulated pay nothing
+
+    def __init__(self, core, retiring):
+        # retiring(kind) -> (pc, instruction) of the instruction writing the RF ("rf") or DMEM ("mem")
+        self.commits = deque()
+        self.retiring = retiring
+        registers, memory = core.myRF, core.ext_dmem
+        write_rf, write_data_mem = registers.write_rf, memory.write_data_mem
+
+        def logged_write_rf(reg_addr: int, wrt_reg_data: int):
+            write_rf(reg_addr, wrt_reg_data)
+            if reg_addr != 0:
+                self.commits.append(Commit(*self.retiring("rf"), f"x{reg_addr}", registers.read_rf(reg_addr)))
+
+        # read_data of the class - an armed debugger wraps the instance one and would see the read as an access
+        read_data = type(memory).read_data
+
+        def logged_write_data_mem(address: int, write_data: int, size: int = 4):
+            # the commit is the whole word the store fell in
+            write_data_mem(address, write_data, size)
+            address = address - address % 4
+            self.commits.append(Commit(*self.retiring("mem"), f"DMem[{address}]", read_data(memory, address)))
+
+        registers.write_rf = logged_write_rf
+        memory.write_data_mem = logged_write_data_mem
+
+
+class LockstepCosim(object):
+    # every instruction FS retires is checked against the next instruction SS commits
+
+    def __init__(self, ss_core: SingleStageCore, fs_core: FiveStageCore):
+        self.ss_core = ss_core
+        self.fs_core = fs_core
+        self.ss_log = CommitLog(ss_core, self.ss_retiring)
+        self.fs_log = CommitLog(fs_core, self.fs_retiring)
+
+    def ss_retiring(self, kind: str):
+        pc = self.ss_core.state.IF.PC
+        return pc, decode(int(self.ss_core.ext_imem.read_instr(pc), 2))
+
+    def fs_retiring(self, kind: str):
+        # register writes happen in WB, stores in MEM - state still holds the latches of the cycle
+        instruction_ob = self.fs_core.state.WB.instruction_ob if kind == "rf" else self.fs_core.state.MEM.instruction_ob
+        return instruction_ob.pc, instruction_ob.instruction
+
+    def next_ss_commit(self) -> Commit:
+        while not self.ss_log.commits and not self.ss_core.halted:
+            self.ss_core.step()
+        return self.ss_log.commits.popleft() if self.ss_log.commits else None
+
+    def run(self):
+        while not self.fs_core.halted:
+            cycle = self.fs_core.cycle
+            self.fs_core.step()
+            while self.fs_log.commits:
+                fs_commit = self.fs_log.commits.popleft()
+                ss_commit = self.next_ss_commit()
+                if not fs_commit.matches(ss_commit):
+                    raise CosimMismatch(cycle, ss_commit, fs_commit)
+
+        # SS must not commit anything FS never retired
+        ss_commit = self.next_ss_commit()
+        if ss_commit is not None:
+            raise CosimMismatch(self.fs_core.cycle - 1, ss_commit, None)
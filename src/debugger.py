@@ -0,0 +1,193 @@
+import operator
+import os
+import pickle
+import re
+
+from models import rebuild_image
+from rv32i_simulator import FiveStageCore
+
+# register condition - x<reg> <op> <value>, value in any base int() accepts (0x.., -5, ...)
+CONDITION = re.compile(r"^\s*x(\d+)\s*(==|!=|<=|>=|<|>)\s*(-?\w+)\s*$")
+OPERATORS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt,
+             ">=": operator.ge}
+
+# watchpoint access modes
+READ = 1
+WRITE = 2
+MODES = {"r": READ, "w": WRITE, "rw": READ | WRITE}
+
+# core attributes saved in a checkpoint, besides RF and DMEM
+CHECKPOINT_FIELDS = ["cycle", "halted", "state", "nextState", "flush_pending", "flush_pc", "memory_cycles"]
+
+
+class Hit(object):
+
+    def __init__(self, core: str, cycle: int, reason: str):
+        self.core = core  # SS / FS
+        self.cycle = cycle  # cycle about to run (PC breakpoints) or just run (conditions, watchpoints)
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.core} cycle {self.cycle}: {self.reason}"
+
+
+class Debugger(object):
+    # PC breakpoints, register conditions and DMEM watchpoints of one core. Checks live in instance attributes
+    # installed by arm over step / read_data / write_data_mem - a core without armed breakpoints runs the plain
+    # class methods and pays nothing.
+
+    def __init__(self, core, on_hit=None):
+        # on_hit(debugger, hit) - called with the core paused between cycles
+        self.core = core
+        self.name = core.ext_dmem.id
+        self.on_hit = on_hit
+        self.breakpoints = frozenset()
+        self.conditions = []  # (register, compare, value, text)
+        self.watchpoints = {}  # word address -> READ / WRITE bitmask
+        self.condition_held = []  # last outcome of every condition - hits are reported when one becomes true
+        self.watch_hits = []  # watchpoint hits of the cycle being run
+        self.previous_pc = None  # PC checked before the previous cycle - a stalled instruction hits only once
+        self.installed = {}  # object, attribute -> value replaced by arm (None - class attribute)
+        self.last_checkpoint = None  # (path, DMEM epoch) of the last checkpoint written - base of the next one
+        self.checkpoints = 0  # checkpoints written - numbers them, a cycle can hit several times
+
+    def break_at(self, pc: int):
+        self.breakpoints = self.breakpoints | {pc}
+
+    def break_when(self, condition: str):
+        match = CONDITION.match(condition)
+        if not match or int(match.group(1)) > 31:
+            raise Exception(f"Invalid register condition - {condition}")
+        register, op, value = match.groups()
+        self.conditions.append((int(register), OPERATORS[op], int(value, 0), f"x{register} {op} {value}"))
+        self.condition_held.append(False)
+
+    def watch(self, address: int, mode: str = "rw"):
+        if mode not in MODES:
+            raise Exception(f"Invalid watchpoint mode - {mode}")
+        address = address - address % 4
+        self.watchpoints[address] = self.watchpoints.get(address, 0) | MODES[mode]
+
+    def armed(self) -> bool:
+        return bool(self.breakpoints or self.conditions or self.watchpoints)
+
+    def install(self, ob, attribute: str, value):
+        self.installed[(ob, attribute)] = ob.__dict__.get(attribute)
+        setattr(ob, attribute, value)
+
+    def arm(self):
+        self.disarm()
+        if not self.armed():
+            return
+        self.install(self.core, "step", self.step)
+        if self.watchpoints:
+            memory = self.core.ext_dmem
+            read_data, write_data_mem = memory.read_data, memory.write_data_mem
+
+            # watchpoints are word granular - byte / half word accesses hit the word they fall in
+            def watched_read_data(read_address: int, size: int = 4, signed: bool = True) -> int:
+                value = read_data(read_address, size, signed)
+                if self.watchpoints.get(read_address - read_address % 4, 0) & READ:
+                    self.watch_hits.append(f"read DMem[{read_address - read_address % 4}] = {value}")
+                return value
+
+            def watched_write_data_mem(address: int, write_data: int, size: int = 4):
+                write_data_mem(address, write_data, size)
+                if self.watchpoints.get(address - address % 4, 0) & WRITE:
+                    self.watch_hits.append(f"write DMem[{address - address % 4}] = {read_data(address)}")
+
+            self.install(memory, "read_data", watched_read_data)
+            self.install(memory, "write_data_mem", watched_write_data_mem)
+
+    def disarm(self):
+        for (ob, attribute), value in self.installed.items():
+            if value is None:
+                delattr(ob, attribute)
+            else:
+                setattr(ob, attribute, value)
+        self.installed = {}
+
+    def next_pc(self):
+        # PC of the instruction the next cycle issues - decoded in ID (FS) / executed (SS), None for a bubble
+        if isinstance(self.core, FiveStageCore):
+            return None if self.core.state.ID.nop else self.core.state.IF.PC - 4
+        return None if self.core.state.IF.nop else self.core.state.IF.PC
+
+    def hit(self, cycle: int, reason: str):
+        if self.on_hit is not None:
+            self.on_hit(self, Hit(self.name, cycle, reason))
+
+    def step(self):
+        core = self.core
+        pc = self.next_pc()
+        if pc in self.breakpoints and pc != self.previous_pc:
+            self.hit(core.cycle, f"breakpoint at PC {pc}")
+        self.previous_pc = pc
+
+        cycle = core.cycle
+        type(core).step(core)
+
+        watch_hits, self.watch_hits = self.watch_hits, []
+        for reason in watch_hits:
+            self.hit(cycle, reason)
+        for index, (register, compare, value, text) in enumerate(self.conditions):
+            held = compare(core.myRF.read_rf(register), value)
+            if held and not self.condition_held[index]:
+                self.hit(cycle, f"{text} (x{register} = {core.myRF.read_rf(register)})")
+            self.condition_held[index] = held
+
+    def dump_state(self) -> str:
+        core = self.core
+        if isinstance(core, FiveStageCore):
+            state = str(core.state)
+        else:
+            state = f"IF.PC: {core.state.IF.PC}\nIF.nop: {core.state.IF.nop}"
+        registers = [f"x{index} = {val}" for index, val in enumerate(core.myRF.registers) if val]
+        return f"{core.stages} core before cycle {core.cycle}\n{state}\nRF: {', '.join(registers) or 'all zero'}"
+
+    def write_checkpoint(self, directory: str) -> str:
+        # the first checkpoint holds the whole DMEM, the later ones only the pages written since the one before
+        path = os.path.join(directory, f"{self.name}_checkpoint_{self.core.cycle}_{self.checkpoints}.pkl")
+        self.checkpoints += 1
+        self.last_checkpoint = (path, write_checkpoint(self.core, path, self.last_checkpoint))
+        return path
+
+
+def write_checkpoint(core, path: str, base: tuple = None) -> int:
+    # pipeline state, RF and DMEM of a core between two cycles - restored with load_checkpoint
+    # base - (path, epoch) of an earlier checkpoint of the core in the same directory, DMEM is then saved as the
+    # pages written since. Returns the epoch to pass as base of the next checkpoint.
+    checkpoint = {field: getattr(core, field) for field in CHECKPOINT_FIELDS if hasattr(core, field)}
+    checkpoint["registers"] = list(core.myRF.registers)
+    # a checkpoint overwriting its base would be its own base - it holds the whole DMEM then
+    if base is None or os.path.abspath(path) == os.path.abspath(base[0]):
+        checkpoint["memory"] = core.ext_dmem.to_bytes()
+    else:
+        checkpoint["memory_base"] = os.path.basename(base[0])
+        checkpoint["memory_pages"] = core.ext_dmem.delta(base[1])
+    with open(path, "wb") as file:
+        pickle.dump(checkpoint, file)
+    return core.ext_dmem.new_epoch()
+
+
+def checkpoint_memory(path: str, checkpoint: dict) -> bytes:
+    # DMEM of a checkpoint - incremental ones are applied on top of their base chain
+    if "memory" in checkpoint:
+        return checkpoint["memory"]
+    base_path = os.path.join(os.path.dirname(path), checkpoint["memory_base"])
+    with open(base_path, "rb") as file:
+        base = pickle.load(file)
+    return rebuild_image(checkpoint_memory(base_path, base), [checkpoint["memory_pages"]])
+
+
+def load_checkpoint(core, path: str):
+    # core must run the program the checkpoint was taken from
+    with open(path, "rb") as file:
+        checkpoint = pickle.load(file)
+    core.ext_dmem.restore(checkpoint_memory(path, checkpoint))
+    for key in ["memory", "memory_base", "memory_pages"]:
+        checkpoint.pop(key, None)
+    for index, val in enumerate(checkpoint.pop("registers")):
+        core.myRF.write_rf(index, val)
+    for field, value in checkpoint.items():
+        setattr(core, field, value)
@@ -0,0 +1,277 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from riscvmodel import insn
+
+from models import load_image
+from pipeline_config import PipelineConfig
+from rv32i_simulator import MemSize
+from simulator import Simulator
+
+R_TYPE = ["add", "sub", "xor", "or", "and", "sll", "srl", "sra", "slt", "sltu"]
+I_TYPE = ["addi", "xori", "ori", "andi", "slti", "sltiu"]
+SHIFTS = ["slli", "srli", "srai"]
+U_TYPE = ["lui", "auipc"]
+# access size in bytes - offsets are kept aligned to it
+LOADS = {"lb": 1, "lbu": 1, "lh": 2, "lhu": 2, "lw": 4}
+STORES = {"sb": 1, "sh": 2, "sw": 4}
+BRANCHES = ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
+# few registers - most instructions read a register written by one of the last few
+REGISTERS = list(range(1, 8))
+# load / store bases are masked into [0, ADDRESS_MASK] right before the access, offsets stay below MAX_OFFSET
+ADDRESS_MASK = 0x7c
+MAX_OFFSET = 64
+DATA_BYTES = 256
+# branches and jumps only go forward, at most MAX_SKIP instructions - every program reaches HALT. jalr jumps to an
+# absolute address off x0 - its 12-bit immediate reaches HALT (at most 2044) of programs up to 511 instructions. A
+# load / store with its masking andi can end a program one instruction past --length
+MAX_SKIP = 6
+MAX_LENGTH = 510
+
+
+class Op(object):
+    # one instruction of a generated program - branch / jump targets are instruction indices, so instructions can
+    # be removed without recomputing offsets by hand
+
+    def __init__(self, mnemonic: str, rd: int = 0, rs1: int = 0, rs2: int = 0, imm: int = 0, target: int = None):
+        self.mnemonic = mnemonic
+        self.rd = rd
+        self.rs1 = rs1
+        self.rs2 = rs2
+        self.imm = imm
+        self.target = target  # index of the branch / jump target, len(program) - HALT
+
+    def instruction(self, index: int):
+        cls = getattr(insn, "Instruction" + self.mnemonic.upper())
+        if self.mnemonic in R_TYPE:
+            return cls(self.rd, self.rs1, self.rs2)
+        if self.mnemonic in I_TYPE or self.mnemonic in SHIFTS or self.mnemonic in LOADS:
+            return cls(self.rd, self.rs1, self.imm)
+        if self.mnemonic in STORES:
+            return cls(self.rs1, self.rs2, self.imm)
+        if self.mnemonic in U_TYPE:
+            return cls(self.rd, self.imm)
+        if self.mnemonic in BRANCHES:
+            return cls(self.rs1, self.rs2, (self.target - index) * 4)
+        if self.mnemonic == "jalr":
+            return cls(self.rd, 0, self.target * 4)
+        return cls(self.rd, (self.target - index) * 4)
+
+
+def encode(program: list) -> list:
+    # 32-bit words ending with the HALT word - an image models.load_image accepts
+    return [op.instruction(index).encode() for index, op in enumerate(program)] + [0xffffffff]
+
+
+def listing(program: list) -> list:
+    # Code.asm lines - "PC: instruction", read by profiler.read_source
+    return [f"{index * 4}: {op.instruction(index)}\n" for index, op in enumerate(program)] + \
+           [f"{len(program) * 4}: HALT\n"]
+
+
+def generate(rng: random.Random, length: int) -> list:
+    program = []
+    recent = []  # destinations of the last instructions - sources are biased towards them
+
+    def source() -> int:
+        if recent and rng.random() < 0.6:
+            return rng.choice(recent)
+        return rng.choice(REGISTERS + [0])
+
+    def written(rd: int):
+        recent.append(rd)
+        del recent[:-3]
+
+    while len(program) < length:
+        kind = rng.random()
+        if kind < 0.3:
+            op = Op(rng.choice(R_TYPE), rd=rng.choice(REGISTERS), rs1=source(), rs2=source())
+            written(op.rd)
+            program.append(op)
+        elif kind < 0.5:
+            op = Op(rng.choice(I_TYPE), rd=rng.choice(REGISTERS), rs1=source(), imm=rng.randint(-2048, 2047))
+            written(op.rd)
+            program.append(op)
+        elif kind < 0.55:
+            op = Op(rng.choice(SHIFTS), rd=rng.choice(REGISTERS), rs1=source(), imm=rng.randint(0, 31))
+            written(op.rd)
+            program.append(op)
+        elif kind < 0.6:
+            op = Op(rng.choice(U_TYPE), rd=rng.choice(REGISTERS), imm=rng.randint(0, 0xfffff))
+            written(op.rd)
+            program.append(op)
+        elif kind < 0.85:
+            # keep the address in range - the masking andi is itself a RAW hazard for the access
+            base = rng.choice(REGISTERS)
+            program.append(Op("andi", rd=base, rs1=source(), imm=ADDRESS_MASK))
+            if rng.random() < 0.6:
+                mnemonic = rng.choice(list(LOADS))
+                op = Op(mnemonic, rd=rng.choice(REGISTERS), rs1=base, imm=rng.randrange(0, MAX_OFFSET, LOADS[mnemonic]))
+                written(op.rd)
+            else:
+                mnemonic = rng.choice(list(STORES))
+                op = Op(mnemonic, rs1=base, rs2=source(), imm=rng.randrange(0, MAX_OFFSET, STORES[mnemonic]))
+            program.append(op)
+        elif kind < 0.95:
+            program.append(Op(rng.choice(BRANCHES), rs1=source(), rs2=source(),
+                              target=len(program) + rng.randint(1, MAX_SKIP)))
+        else:
+            op = Op(rng.choice(["jal", "jalr"]), rd=rng.choice(REGISTERS),
+                    target=len(program) + rng.randint(1, MAX_SKIP))
+            written(op.rd)
+            program.append(op)
+
+    # targets past the end land on HALT
+    for op in program:
+        if op.target is not None:
+            op.target = min(op.target, len(program))
+    return program
+
+
+def bound_stores(memory):
+    # DataMem grows to any store address - a wrong address computed by a buggy core must fail, not allocate gigabytes
+    write_data_mem = memory.write_data_mem
+
+    def bounded_write_data_mem(address: int, write_data: int, size: int = 4):
+        if not 0 <= address < MemSize:
+            raise Exception(f"Data MEM - store out of range: {address}")
+        write_data_mem(address, write_data, size)
+
+    memory.write_data_mem = bounded_write_data_mem
+
+
+def check(program: list, data: bytes, core: str = "FS", config: dict = None) -> str:
+    # None if the pipelined core (FS / SC) ends with the RF / DMEM of SS, else what differs. Programs SS cannot run
+    # are not failures. config - PipelineConfig dict of the pipelined core, the default pipeline when not given.
+    # generated loads use real RV32I encodings - funct3 000 is LB here, not the LW of the test programs
+    config = PipelineConfig.from_dict(dict(config or {}, legacy_lw=False))
+    cores = Simulator(encode(program), data, cores=("SS", core), config=config).build_cores()
+    limit = (4 + config.memory_latency) * len(program) + 50
+    for name, pipeline in cores.items():
+        bound_stores(pipeline.ext_dmem)
+        try:
+            while not pipeline.halted:
+                if pipeline.cycle > limit:
+                    return f"{name} did not halt within {limit} cycles"
+                pipeline.step()
+        except Exception as e:
+            if name == "SS":
+                return None
+            return f"{name} raised {type(e).__name__}: {e}"
+
+    ss, fs = cores["SS"], cores[core]
+    differences = [f"x{index} SS {ss_val} {core} {fs_val}"
+                   for index, (ss_val, fs_val) in enumerate(zip(ss.myRF.registers, fs.myRF.registers))
+                   if ss_val != fs_val]
+    ss_memory, fs_memory = ss.ext_dmem.to_bytes(), fs.ext_dmem.to_bytes()
+    differences += [f"DMem[{address}] SS {ss_memory[address: address + 4].hex()} "
+                    f"{core} {fs_memory[address: address + 4].hex()}"
+                    for address in range(0, max(len(ss_memory), len(fs_memory)), 4)
+                    if ss_memory[address: address + 4] != fs_memory[address: address + 4]]
+    return ", ".join(differences) or None
+
+
+def remove(program: list, start: int, count: int) -> list:
+    # program without instructions [start, start + count) - targets inside the gap move to the instruction after it
+    end = start + count
+    result = []
+    for op in program[:start] + program[end:]:
+        if op.target is not None and op.target >= start:
+            op = Op(op.mnemonic, op.rd, op.rs1, op.rs2, op.imm, start if op.target < end else op.target - count)
+        result.append(op)
+    return result
+
+
+def minimize(program: list, data: bytes, core: str = "FS", config: dict = None) -> list:
+    # drop chunks of halving size while the program still fails
+    chunk = len(program) // 2
+    while chunk >= 1:
+        start = 0
+        while start < len(program):
+            candidate = remove(program, start, chunk)
+            if candidate and check(candidate, data, core, config) is not None:
+                program = candidate
+            else:
+                start += chunk
+        chunk //= 2
+    return program
+
+
+def generate_case(seed: int, length: int):
+    # program and data image of a seed - failures are reported by seed and regenerated for minimization
+    rng = random.Random(seed)
+    program = generate(rng, length)
+    return program, bytes([rng.randrange(256) for _ in range(DATA_BYTES)])
+
+
+def fuzz_one(job: tuple):
+    # (seed, length, core, config dict) -> seed if the program fails, else None
+    seed, length, core, config = job
+    return None if check(*generate_case(seed, length), core, config) is None else seed
+
+
+def minimize_case(job: tuple):
+    # (seed, length, core, config dict) -> (seed, failure of the minimized program, minimized program, data)
+    seed, length, core, config = job
+    program, data = generate_case(seed, length)
+    program = minimize(program, data, core, config)
+    return seed, check(program, data, core, config), program, data
+
+
+def write_failure(directory: str, seed: int, failure: str, program: list, data: bytes):
+    # reproducer - python main.py --lb --iodir <directory>/seed_<seed>, with --issue-width 2 for SC failures
+    case_dir = os.path.join(directory, f"seed_{seed}")
+    os.makedirs(case_dir, exist_ok=True)
+    with open(os.path.join(case_dir, "imem.txt"), "w") as file:
+        file.writelines([line + "\n" for line in load_image(encode(program))])
+    with open(os.path.join(case_dir, "dmem.txt"), "w") as file:
+        file.writelines([line + "\n" for line in load_image(data)])
+    with open(os.path.join(case_dir, "Code.asm"), "w") as file:
+        file.writelines(listing(program))
+        file.write(f"\n/* {failure} */\n")
+    return case_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RV32I differential fuzzer - FS or SC against SS')
+    parser.add_argument("--programs", default=1000, type=int, help="Number of random programs.")
+    parser.add_argument("--length", default=40, type=int, help=f"Instructions per program, at most {MAX_LENGTH}.")
+    parser.add_argument("--seed", default=0, type=int, help="Seed of the first program, the others follow.")
+    parser.add_argument("--processes", default=os.cpu_count(), type=int, help="Number of worker processes.")
+    parser.add_argument("--out", default="fuzz_failures", type=str, help="Directory for minimized failing programs.")
+    parser.add_argument("--max-failures", default=20, type=int, help="Failing programs written at most.")
+    parser.add_argument("--core", default="FS", type=str, choices=["FS", "SC"],
+                        help="Pipelined core checked against SS - SC is the superscalar core.")
+    parser.add_argument("--issue-width", default=2, type=int, help="Issue width of SC.")
+    parser.add_argument("--forwarding", default="on", type=str, choices=["on", "off"], help="Forwarding setting.")
+    parser.add_argument("--branch", default="ID", type=str, choices=["ID", "EX"], help="Branch resolution stage.")
+    parser.add_argument("--memory-latency", default=1, type=int, help="Cycles of a load / store in MEM.")
+    args = parser.parse_args()
+    if not 1 <= args.length <= MAX_LENGTH:
+        parser.error(f"--length must be between 1 and {MAX_LENGTH} - jalr targets are absolute 12-bit immediates")
+
+    config = PipelineConfig(args.forwarding == "on", args.branch, args.memory_latency,
+                            issue_width=args.issue_width if args.core == "SC" else 1).to_dict()
+    start = time.time()
+    jobs = [(seed, args.length, args.core, config) for seed in range(args.seed, args.seed + args.programs)]
+    with multiprocessing.Pool(args.processes) as pool:
+        failures = sorted([seed for seed in pool.imap_unordered(fuzz_one, jobs, chunksize=16) if seed is not None])
+        elapsed = time.time() - start
+        print(f"{args.programs} programs, {len(failures)} failing, {60 * args.programs / elapsed:.0f} programs/minute",
+              flush=True)
+
+        # only the failures which are written out are minimized
+        cases = [(seed, args.length, args.core, config) for seed in failures[:args.max_failures]]
+        for seed, failure, program, data in pool.imap_unordered(minimize_case, cases):
+            case_dir = write_failure(args.out, seed, failure, program, data)
+            print(f"seed {seed}: {len(program)} instructions - {failure} ({case_dir})", flush=True)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,8 @@ from abc import ABC
 from riscvmodel.code import decode
 from riscvmodel.isa import Instruction
 
-from models import DataMem, RegisterFile, State, EXState, WBState, MEMState
+from models import DataMem, RegisterFile, State, EXState, WBState, MEMState, to_int32
+from pipeline_config import DEFAULT_CONFIG
 
 
 # TODO:
@@ -25,6 +26,84 @@ class InstructionBase(metaclass=abc.ABCMeta):
         self.state = state
         self.nextState = nextState
         self.stages = self.memory.id
+        self.pc: int = None  # address of the instruction - set by the FS core at decode
+        self.stats = None  # ExecutionStats of the core - bound on every FS stage call
+        self.config = DEFAULT_CONFIG  # PipelineConfig of the core - bound on every FS stage call
+        self.stalled: bool = False  # Flag - instruction held in ID by a hazard
+        self.stall_class: str = None  # CPI stack class of the stall - load_use_stall / raw_stall
+        self.flushed: bool = False  # Flag - taken branch / jump squashed the next fetch
+
+    def __repr__(self):
+        # deterministic state dumps - StateResult_FS.txt can be compared between runs
+        return f"<{type(self).__name__}: {self.instruction}>"
+
+    def __getstate__(self):
+        # checkpoints - memory, registers and states are bound again on every FS stage call
+        state = dict(self.__dict__)
+        state.update(memory=None, registers=None, state=None, nextState=None, stats=None)
+        return state
+
+    def note_stall(self, cycle_class: str = "load_use_stall"):
+        self.stalled = True
+        self.stall_class = cycle_class
+        if self.stats is not None and cycle_class == "load_use_stall":
+            self.stats.load_use_stall()
+
+    def stall_fs(self, ex_state: EXState, cycle_class: str = "load_use_stall"):
+        # hold the instruction in ID for a cycle - a bubble goes to EX and the fetch behind it is repeated
+        self.note_stall(cycle_class)
+        ex_state.nop = True
+        self.state.IF.PC -= 4
+        self.nextState.EX = ex_state
+        self.nextState.IF.instruction_count = self.nextState.IF.instruction_count - 1
+
+    def load_use_hazard(self, *sources) -> bool:
+        # a register read in ID is loaded by the instruction in EX - the value only exists after its MEM stage
+        return not self.state.EX.nop and self.state.EX.read_data_mem and self.state.EX.destination_register != 0 \
+            and self.state.EX.destination_register in sources
+
+    def raw_hazard(self, *sources) -> bool:
+        # a register read in ID is still being produced by the instruction in EX or MEM - without forwarding the
+        # value is only read after it was written back
+        sources = [source for source in sources if source != 0]
+        return (not self.state.EX.nop and self.state.EX.write_back_enable and
+                self.state.EX.destination_register in sources) or \
+               (not self.state.MEM.nop and self.state.MEM.write_back_enable and
+                self.state.MEM.write_register_addr in sources)
+
+    def hazard_stall(self, ex_state: EXState, *sources) -> bool:
+        # True when the instruction has to wait in ID for one of its source registers - ex_state went to EX as bubble
+        if self.load_use_hazard(*sources):
+            self.stall_fs(ex_state)
+            return True
+        if not self.config.forwarding and self.raw_hazard(*sources):
+            self.stall_fs(ex_state, "raw_stall")
+            return True
+        return False
+
+    def read_operand(self, register: int) -> int:
+        # value of a source register in ID - the youngest producer still in flight wins: the instruction in EX (its
+        # result is in nextState.MEM by now), then the one in MEM (nextState.WB), else the RF, which WB has already
+        # written this cycle
+        if register != 0 and self.config.forwarding:
+            if not self.state.EX.nop and self.state.EX.write_back_enable and \
+                    self.state.EX.destination_register == register:
+                self.note_forward("EX")
+                return self.nextState.MEM.store_data
+            if not self.state.MEM.nop and self.state.MEM.write_back_enable and \
+                    self.state.MEM.write_register_addr == register:
+                self.note_forward("MEM")
+                return self.nextState.WB.store_data
+        return self.registers.read_rf(register)
+
+    def note_flush(self):
+        self.flushed = True
+        if self.stats is not None:
+            self.stats.branch_flush()
+
+    def note_forward(self, source: str):
+        if self.stats is not None:
+            self.stats.forwarded(source)
 
     def decode_ss(self, *args, **kwargs):
         pass
@@ -63,51 +142,45 @@ class InstructionBase(metaclass=abc.ABCMeta):
         if self.state.WB.write_back_enable:
             self.registers.write_rf(self.state.WB.write_register_addr, self.state.WB.store_data)
 
+    def run_stage(self, stage_function, *args, **kwargs):
+        # run an FS stage against the state / nextState of the cycle. The latches keep instruction objects alive
+        # after their stage call - holding on to the states of that cycle would chain every past state (and its
+        # instruction objects) together, so they are dropped again once the stage is done.
+        self.state = kwargs["state"]
+        self.nextState = kwargs["nextState"]
+        self.memory = kwargs["memory"]
+        self.registers = kwargs["registers"]
+        self.stats = kwargs.get("stats")
+        self.config = kwargs.get("config") or DEFAULT_CONFIG
+        state, nextState = self.state, self.nextState
+        response = stage_function(*args, **kwargs)
+        self.state = self.nextState = None
+        return state, nextState, self.memory, self.registers, response
+
     def decode(self, *args, **kwargs):
         if self.stages == "SS":
             return self.decode_ss(*args, **kwargs)
-        else:
-            self.state = kwargs["state"]
-            self.nextState = kwargs["nextState"]
-            self.memory = kwargs["memory"]
-            self.registers = kwargs["registers"]
-            return self.state, self.nextState, self.memory, self.registers, self.decode_fs(*args, **kwargs)
+        return self.run_stage(self.decode_fs, *args, **kwargs)
 
     def execute(self, *args, **kwargs):
         if self.stages == "SS":
             return self.execute_ss(*args, **kwargs)
-        else:
-            self.state = kwargs["state"]
-            self.nextState = kwargs["nextState"]
-            self.memory = kwargs["memory"]
-            self.registers = kwargs["registers"]
-            response = self.execute_fs(*args, **kwargs)
-            return self.state, self.nextState, self.memory, self.registers, response
+        return self.run_stage(self.execute_fs, *args, **kwargs)
 
     def mem(self, *args, **kwargs):
         if self.stages == "SS":
             return self.mem_ss(*args, **kwargs)
-        else:
-            self.state = kwargs["state"]
-            self.nextState = kwargs["nextState"]
-            self.memory = kwargs["memory"]
-            self.registers = kwargs["registers"]
-            response = self.mem_fs(*args, **kwargs)
-            return self.state, self.nextState, self.memory, self.registers, response
+        return self.run_stage(self.mem_fs, *args, **kwargs)
 
     def wb(self, *args, **kwargs):
         if self.stages == "SS":
             return self.wb_ss(*args, **kwargs)
-        else:
-            self.state = kwargs["state"]
-            self.nextState = kwargs["nextState"]
-            self.memory = kwargs["memory"]
-            self.registers = kwargs["registers"]
-            response = self.wb_fs(*args, **kwargs)
-            return self.state, self.nextState, self.memory, self.registers, response
+        return self.run_stage(self.wb_fs, *args, **kwargs)
 
 
 class InstructionRBase(InstructionBase, ABC):
+    category = "R"  # instruction class reported in the instruction mix
+
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
         super(InstructionRBase, self).__init__(instruction, memory, registers, state, nextState)
@@ -121,41 +194,22 @@ class InstructionRBase(InstructionBase, ABC):
 
     def decode_fs(self, *args, **kwargs):
         ex_state = EXState()
-
-        # TODO: Handle Hazards
-        #   set nop for EX state
-        #   will be applicable in R, I, S, B, J type instructions
-
         ex_state.set_attributes(
             instruction_ob=self,
             nop=self.state.ID.nop,
-            operand1=self.registers.read_rf(self.rs1),
-            operand2=self.registers.read_rf(self.rs2),
             destination_register=self.rd,
             write_back_enable=True
         )
 
         # Stall
-        if self.state.EX.destination_register in [self.rs1,
-                                                  self.rs2] and self.state.EX.read_data_mem and self.rs1 != 0 and self.rs2 != 0:
-            ex_state.nop = True
-            self.state.IF.PC -= 4
-            self.nextState.EX = ex_state
-            self.nextState.IF.instruction_count = self.nextState.IF.instruction_count - 1
+        if self.hazard_stall(ex_state, self.rs1, self.rs2):
             return
 
         # Forwarding
-        if self.state.MEM.read_data_mem and self.state.MEM.write_back_enable and not self.state.MEM.write_data_mem and self.state.MEM.write_register_addr == self.rs1 and self.rs1 != 0:
-            ex_state.operand1 = self.nextState.WB.store_data
-
-        if self.state.MEM.read_data_mem and self.state.MEM.write_back_enable and not self.state.MEM.write_data_mem and self.state.MEM.write_register_addr == self.rs2 and self.rs2 != 0:
-            ex_state.operand2 = self.nextState.WB.store_data
-
-        if not self.state.EX.read_data_mem and self.state.EX.write_back_enable and not self.state.EX.write_data_mem and self.state.EX.destination_register == self.rs1 and self.rs1 != 0:
-            ex_state.operand1 = self.nextState.MEM.store_data
-
-        if not self.state.EX.read_data_mem and self.state.EX.write_back_enable and not self.state.EX.write_data_mem and self.state.EX.destination_register == self.rs2 and self.rs2 != 0:
-            ex_state.operand2 = self.nextState.MEM.store_data
+        ex_state.set_attributes(
+            operand1=self.read_operand(self.rs1),
+            operand2=self.read_operand(self.rs2)
+        )
 
         self.nextState.EX = ex_state
 
@@ -172,12 +226,15 @@ class InstructionRBase(InstructionBase, ABC):
 
 
 class InstructionIBase(InstructionBase, ABC):
+    category = "I"  # instruction class reported in the instruction mix
+
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
         super(InstructionIBase, self).__init__(instruction, memory, registers, state, nextState)
         self.rs1 = instruction.rs1
         self.rd = instruction.rd
-        self.imm = instruction.imm.value
+        # shifts by an immediate carry the shift amount instead of an immediate
+        self.imm = instruction.shamt.value if hasattr(instruction, "shamt") else instruction.imm.value
 
     def wb_ss(self, *args, **kwargs):
         data = kwargs['alu_result']
@@ -188,7 +245,6 @@ class InstructionIBase(InstructionBase, ABC):
         ex_state.set_attributes(
             instruction_ob=self,
             nop=self.state.ID.nop,
-            operand1=self.registers.read_rf(self.rs1),
             operand2=self.imm,
             destination_register=self.rd,
             write_back_enable=True,
@@ -196,19 +252,11 @@ class InstructionIBase(InstructionBase, ABC):
         )
 
         # Stall
-        if self.state.EX.destination_register == self.rs1 and self.state.EX.read_data_mem and self.rs1 != 0:
-            ex_state.nop = True
-            self.state.IF.PC -= 4
-            self.nextState.EX = ex_state
-            self.nextState.IF.instruction_count = self.nextState.IF.instruction_count - 1
+        if self.hazard_stall(ex_state, self.rs1):
             return
 
         # Forwarding
-        if self.state.MEM.read_data_mem and self.state.MEM.write_back_enable and not self.state.MEM.write_data_mem and self.state.MEM.write_register_addr == self.rs1 and self.rs1 != 0:
-            ex_state.operand1 = self.nextState.WB.store_data
-
-        if not self.state.EX.read_data_mem and self.state.EX.write_back_enable and not self.state.EX.write_data_mem and self.state.EX.destination_register == self.rs1 and self.rs1 != 0:
-            ex_state.operand1 = self.nextState.MEM.store_data
+        ex_state.operand1 = self.read_operand(self.rs1)
 
         self.nextState.EX = ex_state
 
@@ -224,7 +272,47 @@ class InstructionIBase(InstructionBase, ABC):
         self.nextState.MEM = mem_state
 
 
+class InstructionLBase(InstructionIBase, ABC):
+    category = "LOAD"  # instruction class reported in the instruction mix
+    size = 4  # bytes loaded
+    signed = True  # Flag - sign extend the loaded value, else zero extend
+
+    def execute_ss(self, *args, **kwargs):
+        return self.registers.read_rf(self.rs1) + self.imm
+
+    def mem_ss(self, *args, **kwargs):
+        address = kwargs['alu_result']
+        return self.memory.read_data(address, self.size, self.signed)
+
+    def wb_ss(self, *args, **kwargs):
+        data = kwargs['mem_result']
+        return self.registers.write_rf(self.rd, data)
+
+    def decode_fs(self, *args, **kwargs):
+        super(InstructionLBase, self).decode_fs()
+        if not self.stalled:
+            # a stall bubble must not look like a load to the next decode of this instruction
+            self.nextState.EX.read_data_mem = True
+
+    def execute_fs(self, *args, **kwargs):
+        super(InstructionLBase, self).execute_fs()
+        self.nextState.MEM.set_attributes(
+            data_address=self.state.EX.operand1 + self.state.EX.operand2,
+            read_data_mem=True
+        )
+
+    def mem_fs(self, *args, **kwargs):
+        super(InstructionLBase, self).mem_fs(*args, **kwargs)
+        if self.state.MEM.read_data_mem:
+            self.nextState.WB.store_data = self.memory.read_data(
+                self.state.MEM.data_address, self.size, self.signed
+            )
+
+
 class InstructionSBase(InstructionBase, ABC):
+    category = "S"  # instruction class reported in the instruction mix
+    size = 4  # bytes stored - the low bytes of rs2
+
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
         super(InstructionSBase, self).__init__(instruction, memory, registers, state, nextState)
@@ -232,44 +320,33 @@ class InstructionSBase(InstructionBase, ABC):
         self.rs2 = instruction.rs2
         self.imm = instruction.imm.value
 
+    def execute_ss(self, *args, **kwargs):
+        return self.registers.read_rf(self.rs1) + self.imm
+
     def mem_ss(self, *args, **kwargs):
         address = kwargs['alu_result']
         data = self.registers.read_rf(self.rs2)
-        self.memory.write_data_mem(address, data)
+        self.memory.write_data_mem(address, data, self.size)
 
     def decode_fs(self, *args, **kwargs):
         ex_state = EXState()
         ex_state.set_attributes(
             instruction_ob=self,
             nop=self.state.ID.nop,
-            operand1=self.registers.read_rf(self.rs1),
             operand2=self.imm,
-            store_data=self.registers.read_rf(self.rs2),
             destination_register=self.rs2,
             write_data_mem=True,
             halt=self.state.ID.halt
         )
         # Stall
-        if self.state.EX.destination_register in [self.rs1,
-                                                  self.rs2] and self.state.EX.read_data_mem and self.rs1 != 0 and self.rs2 != 0:
-            ex_state.nop = True
-            self.state.IF.PC -= 4
-            self.nextState.EX = ex_state
-            self.nextState.IF.instruction_count = self.nextState.IF.instruction_count - 1
+        if self.hazard_stall(ex_state, self.rs1, self.rs2):
             return
 
         # Forwarding
-        if not self.state.EX.read_data_mem and self.state.EX.write_back_enable and not self.state.EX.write_data_mem and self.state.EX.destination_register == self.rs1 and self.rs1 != 0:
-            ex_state.operand1 = self.nextState.MEM.store_data
-
-        if not self.state.EX.read_data_mem and self.state.EX.write_back_enable and not self.state.EX.write_data_mem and self.state.EX.destination_register == self.rs2 and self.rs2 != 0:
-            ex_state.store_data = self.nextState.MEM.store_data
-
-        if not self.state.MEM.read_data_mem and self.state.MEM.write_back_enable and not self.state.MEM.write_data_mem and self.state.MEM.write_register_addr == self.rs1 and self.rs1 != 0:
-            ex_state.operand1 = self.nextState.WB.store_data
-
-        if not self.state.MEM.read_data_mem and self.state.MEM.write_back_enable and not self.state.MEM.write_data_mem and self.state.MEM.write_register_addr == self.rs2 and self.rs2 != 0:
-            ex_state.store_data = self.nextState.WB.store_data
+        ex_state.set_attributes(
+            operand1=self.read_operand(self.rs1),
+            store_data=self.read_operand(self.rs2)
+        )
 
         self.nextState.EX = ex_state
 
@@ -287,7 +364,7 @@ class InstructionSBase(InstructionBase, ABC):
 
     def mem_fs(self, *args, **kwargs):
         if self.state.MEM.write_data_mem:
-            self.memory.write_data_mem(self.state.MEM.data_address, self.state.MEM.store_data)
+            self.memory.write_data_mem(self.state.MEM.data_address, self.state.MEM.store_data, self.size)
         wb_state = WBState()
         wb_state.set_attributes(
             instruction_ob=self
@@ -296,6 +373,8 @@ class InstructionSBase(InstructionBase, ABC):
 
 
 class InstructionBBase(InstructionBase, ABC):
+    category = "B"  # instruction class reported in the instruction mix
+
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
         super(InstructionBBase, self).__init__(instruction, memory, registers, state, nextState)
@@ -303,8 +382,10 @@ class InstructionBBase(InstructionBase, ABC):
         self.rs2 = instruction.rs2
         self.imm = instruction.imm.value
 
+    @staticmethod
     @abc.abstractmethod
-    def take_branch(self, operand1, operand2):
+    def take_branch(operand1, operand2):
+        # operands are signed 32-bit values
         pass
 
     def execute_ss(self, *args, **kwargs):
@@ -316,29 +397,35 @@ class InstructionBBase(InstructionBase, ABC):
         mem_state.nop = True
         self.nextState.MEM = mem_state
 
-    def decode_fs(self, *args, **kwargs):
-
-        operand1 = self.registers.read_rf(self.rs1)
-        operand2 = self.registers.read_rf(self.rs2)
-
-        if self.state.EX.write_back_enable and self.state.EX.destination_register != 0 and self.state.EX.destination_register == self.rs1 and self.rs1 != 0:
-            operand1 = self.nextState.MEM.store_data
+        if self.config.branch_resolution == "EX" and self.take_branch(self.state.EX.operand1, self.state.EX.operand2):
+            # resolved in EX - the instructions in ID and IF are squashed, a HALT already fetched is undone
+            self.note_flush()
+            if not self.state.ID.nop:
+                self.nextState.IF.instruction_count = self.nextState.IF.instruction_count - 1
+            self.state.ID.nop = True
+            self.state.IF.nop = True
+            self.nextState.IF.PC = self.pc + self.imm
+            self.nextState.IF.nop = False
+            return True
 
-        if self.state.EX.write_back_enable and self.state.EX.destination_register != 0 and self.state.EX.destination_register == self.rs2 and self.rs2 != 0:
-            operand2 = self.nextState.MEM.store_data
+    def decode_fs(self, *args, **kwargs):
+        ex_state = EXState()
+        ex_state.instruction_ob = self
 
-        if self.state.MEM.write_back_enable and self.state.MEM.write_register_addr != 0 and not (
-                self.state.EX.write_back_enable and self.state.EX.destination_register != 0 and self.state.EX.destination_register == self.rs1) and self.state.MEM.write_register_addr == self.rs1 and self.rs1 != 0:
-            operand1 = self.nextState.WB.store_data
+        # Stall - operands are read in ID, a value loaded by the instruction in EX is only forwarded from MEM
+        if self.hazard_stall(ex_state, self.rs1, self.rs2):
+            return
 
-        if self.state.MEM.write_back_enable and self.state.MEM.write_register_addr != 0 and not (
-                self.state.EX.write_back_enable and self.state.EX.destination_register != 0 and self.state.EX.destination_register == self.rs2) and self.state.MEM.write_register_addr == self.rs2 and self.rs2 != 0:
-            operand2 = self.nextState.WB.store_data
+        operand1 = self.read_operand(self.rs1)
+        operand2 = self.read_operand(self.rs2)
 
-        ex_state = EXState()
-        ex_state.instruction_ob = self
+        if self.config.branch_resolution == "EX":
+            ex_state.set_attributes(operand1=operand1, operand2=operand2)
+            self.nextState.EX = ex_state
+            return
 
         if self.take_branch(operand1, operand2):
+            self.note_flush()
             self.nextState.IF.PC = self.state.IF.PC + self.imm - 4
             self.nextState.ID.nop = True
             self.state.IF.nop = True
@@ -348,6 +435,8 @@ class InstructionBBase(InstructionBase, ABC):
 
 
 class InstructionJBase(InstructionBase, ABC):
+    category = "J"  # instruction class reported in the instruction mix
+
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
         super(InstructionJBase, self).__init__(instruction, memory, registers, state, nextState)
@@ -366,6 +455,7 @@ class InstructionJBase(InstructionBase, ABC):
             write_back_enable=True
         )
 
+        self.note_flush()
         self.nextState.IF.PC = self.state.IF.PC + self.imm - 4
         self.nextState.ID.nop = True
         self.state.IF.nop = True
@@ -383,6 +473,43 @@ class InstructionJBase(InstructionBase, ABC):
         self.nextState.MEM = mem_state
 
 
+class InstructionUBase(InstructionBase, ABC):
+    category = "U"  # instruction class reported in the instruction mix
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(InstructionUBase, self).__init__(instruction, memory, registers, state, nextState)
+        self.rd = instruction.rd
+        self.imm = to_int32(instruction.imm.value << 12)  # the 20-bit immediate is the upper part of the word
+
+    def wb_ss(self, *args, **kwargs):
+        data = kwargs['alu_result']
+        return self.registers.write_rf(self.rd, data)
+
+    def decode_fs(self, *args, **kwargs):
+        ex_state = EXState()
+        ex_state.set_attributes(
+            instruction_ob=self,
+            nop=self.state.ID.nop,
+            operand1=self.imm,
+            destination_register=self.rd,
+            write_back_enable=True,
+            halt=self.state.ID.halt
+        )
+        self.nextState.EX = ex_state
+
+    def execute_fs(self, *args, **kwargs):
+        mem_state = MEMState()
+        mem_state.set_attributes(
+            instruction_ob=self,
+            nop=self.state.EX.nop,
+            write_register_addr=self.state.EX.destination_register,
+            write_back_enable=True,
+            halt=self.state.EX.halt
+        )
+        self.nextState.MEM = mem_state
+
+
 class ADD(InstructionRBase):
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
@@ -393,7 +520,7 @@ class ADD(InstructionRBase):
 
     def execute_fs(self, *args, **kwargs):
         super(ADD, self).execute_fs()
-        self.nextState.MEM.store_data = self.state.EX.operand1 + self.state.EX.operand2
+        self.nextState.MEM.store_data = to_int32(self.state.EX.operand1 + self.state.EX.operand2)
 
 
 class SUB(InstructionRBase):
@@ -407,7 +534,7 @@ class SUB(InstructionRBase):
 
     def execute_fs(self, *args, **kwargs):
         super(SUB, self).execute_fs()
-        self.nextState.MEM.store_data = self.state.EX.operand1 - self.state.EX.operand2
+        self.nextState.MEM.store_data = to_int32(self.state.EX.operand1 - self.state.EX.operand2)
 
 
 class XOR(InstructionRBase):
@@ -451,6 +578,72 @@ class AND(InstructionRBase):
         self.nextState.MEM.store_data = self.state.EX.operand1 & self.state.EX.operand2
 
 
+class SLL(InstructionRBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SLL, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return self.registers.read_rf(self.rs1) << (self.registers.read_rf(self.rs2) & 0x1f)
+
+    def execute_fs(self, *args, **kwargs):
+        super(SLL, self).execute_fs()
+        self.nextState.MEM.store_data = to_int32(self.state.EX.operand1 << (self.state.EX.operand2 & 0x1f))
+
+
+class SRL(InstructionRBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SRL, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return (self.registers.read_rf(self.rs1) & 0xffffffff) >> (self.registers.read_rf(self.rs2) & 0x1f)
+
+    def execute_fs(self, *args, **kwargs):
+        super(SRL, self).execute_fs()
+        self.nextState.MEM.store_data = to_int32((self.state.EX.operand1 & 0xffffffff) >>
+                                                 (self.state.EX.operand2 & 0x1f))
+
+
+class SRA(InstructionRBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SRA, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return self.registers.read_rf(self.rs1) >> (self.registers.read_rf(self.rs2) & 0x1f)
+
+    def execute_fs(self, *args, **kwargs):
+        super(SRA, self).execute_fs()
+        self.nextState.MEM.store_data = self.state.EX.operand1 >> (self.state.EX.operand2 & 0x1f)
+
+
+class SLT(InstructionRBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SLT, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return int(self.registers.read_rf(self.rs1) < self.registers.read_rf(self.rs2))
+
+    def execute_fs(self, *args, **kwargs):
+        super(SLT, self).execute_fs()
+        self.nextState.MEM.store_data = int(self.state.EX.operand1 < self.state.EX.operand2)
+
+
+class SLTU(InstructionRBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SLTU, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return int(self.registers.read_rf(self.rs1) & 0xffffffff < self.registers.read_rf(self.rs2) & 0xffffffff)
+
+    def execute_fs(self, *args, **kwargs):
+        super(SLTU, self).execute_fs()
+        self.nextState.MEM.store_data = int(self.state.EX.operand1 & 0xffffffff < self.state.EX.operand2 & 0xffffffff)
+
+
 class ADDI(InstructionIBase):
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
@@ -461,7 +654,7 @@ class ADDI(InstructionIBase):
 
     def execute_fs(self, *args, **kwargs):
         super(ADDI, self).execute_fs()
-        self.nextState.MEM.store_data = self.state.EX.operand1 + self.state.EX.operand2
+        self.nextState.MEM.store_data = to_int32(self.state.EX.operand1 + self.state.EX.operand2)
 
 
 class XORI(InstructionIBase):
@@ -504,39 +697,126 @@ class ANDI(InstructionIBase):
         self.nextState.MEM.store_data = self.state.EX.operand1 & self.state.EX.operand2
 
 
-class LW(InstructionIBase):
+class SLTI(InstructionIBase):
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
                  nextState: State):
-        super(LW, self).__init__(instruction, memory, registers, state, nextState)
+        super(SLTI, self).__init__(instruction, memory, registers, state, nextState)
 
     def execute_ss(self, *args, **kwargs):
-        return self.registers.read_rf(self.rs1) + self.imm
+        return int(self.registers.read_rf(self.rs1) < self.imm)
 
-    def mem_ss(self, *args, **kwargs):
-        address = kwargs['alu_result']
-        return self.memory.read_data(address)
+    def execute_fs(self, *args, **kwargs):
+        super(SLTI, self).execute_fs()
+        self.nextState.MEM.store_data = int(self.state.EX.operand1 < self.state.EX.operand2)
 
-    def wb_ss(self, *args, **kwargs):
-        data = kwargs['mem_result']
-        return self.registers.write_rf(self.rd, data)
 
-    def decode_fs(self, *args, **kwargs):
-        super(LW, self).decode_fs()
-        self.nextState.EX.read_data_mem = True
+class SLTIU(InstructionIBase):
+    # the immediate is sign extended, then compared unsigned
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SLTIU, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return int(self.registers.read_rf(self.rs1) & 0xffffffff < self.imm & 0xffffffff)
 
     def execute_fs(self, *args, **kwargs):
-        super(LW, self).execute_fs()
-        self.nextState.MEM.set_attributes(
-            data_address=self.state.EX.operand1 + self.state.EX.operand2,
-            read_data_mem=True
-        )
+        super(SLTIU, self).execute_fs()
+        self.nextState.MEM.store_data = int(self.state.EX.operand1 & 0xffffffff < self.state.EX.operand2 & 0xffffffff)
 
-    def mem_fs(self, *args, **kwargs):
-        super(LW, self).mem_fs(*args, **kwargs)
-        if self.state.MEM.read_data_mem:
-            self.nextState.WB.store_data = self.memory.read_data(
-                self.state.MEM.data_address
-            )
+
+class SLLI(InstructionIBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SLLI, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return self.registers.read_rf(self.rs1) << self.imm
+
+    def execute_fs(self, *args, **kwargs):
+        super(SLLI, self).execute_fs()
+        self.nextState.MEM.store_data = to_int32(self.state.EX.operand1 << self.state.EX.operand2)
+
+
+class SRLI(InstructionIBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SRLI, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return (self.registers.read_rf(self.rs1) & 0xffffffff) >> self.imm
+
+    def execute_fs(self, *args, **kwargs):
+        super(SRLI, self).execute_fs()
+        self.nextState.MEM.store_data = to_int32((self.state.EX.operand1 & 0xffffffff) >> self.state.EX.operand2)
+
+
+class SRAI(InstructionIBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SRAI, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return self.registers.read_rf(self.rs1) >> self.imm
+
+    def execute_fs(self, *args, **kwargs):
+        super(SRAI, self).execute_fs()
+        self.nextState.MEM.store_data = self.state.EX.operand1 >> self.state.EX.operand2
+
+
+class FENCE(InstructionIBase):
+    # memory ordering - a single in-order hart has nothing to order, so it retires like a nop
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(FENCE, self).__init__(instruction, memory, registers, state, nextState)
+        self.rs1 = self.rd = 0
+
+    def execute_ss(self, *args, **kwargs):
+        return 0
+
+    def execute_fs(self, *args, **kwargs):
+        super(FENCE, self).execute_fs()
+        self.nextState.MEM.store_data = 0
+
+
+class LW(InstructionLBase):
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(LW, self).__init__(instruction, memory, registers, state, nextState)
+
+
+class LH(InstructionLBase):
+    size = 2
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(LH, self).__init__(instruction, memory, registers, state, nextState)
+
+
+class LHU(InstructionLBase):
+    size = 2
+    signed = False
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(LHU, self).__init__(instruction, memory, registers, state, nextState)
+
+
+class LB(InstructionLBase):
+    size = 1
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(LB, self).__init__(instruction, memory, registers, state, nextState)
+
+
+class LBU(InstructionLBase):
+    size = 1
+    signed = False
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(LBU, self).__init__(instruction, memory, registers, state, nextState)
 
 
 class SW(InstructionSBase):
@@ -544,8 +824,21 @@ class SW(InstructionSBase):
                  nextState: State):
         super(SW, self).__init__(instruction, memory, registers, state, nextState)
 
-    def execute_ss(self, *args, **kwargs):
-        return self.registers.read_rf(self.rs1) + self.imm
+
+class SH(InstructionSBase):
+    size = 2
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SH, self).__init__(instruction, memory, registers, state, nextState)
+
+
+class SB(InstructionSBase):
+    size = 1
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(SB, self).__init__(instruction, memory, registers, state, nextState)
 
 
 class BEQ(InstructionBBase):
@@ -554,7 +847,8 @@ class BEQ(InstructionBBase):
                  nextState: State):
         super(BEQ, self).__init__(instruction, memory, registers, state, nextState)
 
-    def take_branch(self, operand1, operand2):
+    @staticmethod
+    def take_branch(operand1, operand2):
         return operand1 == operand2
 
 
@@ -564,10 +858,55 @@ class BNE(InstructionBBase):
                  nextState: State):
         super(BNE, self).__init__(instruction, memory, registers, state, nextState)
 
-    def take_branch(self, operand1, operand2):
+    @staticmethod
+    def take_branch(operand1, operand2):
         return operand1 != operand2
 
 
+class BLT(InstructionBBase):
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(BLT, self).__init__(instruction, memory, registers, state, nextState)
+
+    @staticmethod
+    def take_branch(operand1, operand2):
+        return operand1 < operand2
+
+
+class BGE(InstructionBBase):
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(BGE, self).__init__(instruction, memory, registers, state, nextState)
+
+    @staticmethod
+    def take_branch(operand1, operand2):
+        return operand1 >= operand2
+
+
+class BLTU(InstructionBBase):
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(BLTU, self).__init__(instruction, memory, registers, state, nextState)
+
+    @staticmethod
+    def take_branch(operand1, operand2):
+        return operand1 & 0xffffffff < operand2 & 0xffffffff
+
+
+class BGEU(InstructionBBase):
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(BGEU, self).__init__(instruction, memory, registers, state, nextState)
+
+    @staticmethod
+    def take_branch(operand1, operand2):
+        return operand1 & 0xffffffff >= operand2 & 0xffffffff
+
+
 class JAL(InstructionJBase):
 
     def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
@@ -575,6 +914,76 @@ class JAL(InstructionJBase):
         super(JAL, self).__init__(instruction, memory, registers, state, nextState)
 
 
+class JALR(InstructionIBase):
+    # target is rs1 + imm with bit 0 cleared - resolved in ID like JAL, once rs1 is available there
+    category = "J"  # instruction class reported in the instruction mix
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(JALR, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        pass
+
+    def decode_fs(self, *args, **kwargs):
+        ex_state = EXState()
+        ex_state.set_attributes(
+            instruction_ob=self,
+            store_data=self.state.IF.PC,
+            destination_register=self.rd,
+            write_back_enable=True
+        )
+
+        # Stall
+        if self.hazard_stall(ex_state, self.rs1):
+            return
+
+        self.note_flush()
+        self.nextState.IF.PC = (self.read_operand(self.rs1) + self.imm) & 0xfffffffe
+        self.nextState.ID.nop = True
+        self.state.IF.nop = True
+
+        self.nextState.EX = ex_state
+
+    def execute_fs(self, *args, **kwargs):
+        mem_state = MEMState()
+        mem_state.set_attributes(
+            instruction_ob=self,
+            store_data=self.state.EX.store_data,
+            write_register_addr=self.rd,
+            write_back_enable=True
+        )
+        self.nextState.MEM = mem_state
+
+
+class LUI(InstructionUBase):
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(LUI, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return self.imm
+
+    def execute_fs(self, *args, **kwargs):
+        super(LUI, self).execute_fs()
+        self.nextState.MEM.store_data = self.state.EX.operand1
+
+
+class AUIPC(InstructionUBase):
+
+    def __init__(self, instruction: Instruction, memory: DataMem, registers: RegisterFile, state: State,
+                 nextState: State):
+        super(AUIPC, self).__init__(instruction, memory, registers, state, nextState)
+
+    def execute_ss(self, *args, **kwargs):
+        return self.pc + self.imm
+
+    def execute_fs(self, *args, **kwargs):
+        super(AUIPC, self).execute_fs()
+        self.nextState.MEM.store_data = to_int32(self.pc + self.state.EX.operand1)
+
+
 class ADDERBTYPE:
     def __init__(self, instruction: Instruction, state: State(), registers: RegisterFile):
         self.instruction = instruction
@@ -585,16 +994,11 @@ class ADDERBTYPE:
         self.imm = instruction.imm.value
 
     def get_pc(self, *args, **kwargs):
-        if self.instruction.mnemonic == 'beq':
-            if self.registers.read_rf(self.rs1) == self.registers.read_rf(self.rs2):
-                return self.state.IF.PC + self.imm
-            else:
-                return self.state.IF.PC + 4
+        cls = get_instruction_class(self.instruction.mnemonic)
+        if cls.take_branch(self.registers.read_rf(self.rs1), self.registers.read_rf(self.rs2)):
+            return self.state.IF.PC + self.imm
         else:
-            if self.registers.read_rf(self.rs1) != self.registers.read_rf(self.rs2):
-                return self.state.IF.PC + self.imm
-            else:
-                return self.state.IF.PC + 4
+            return self.state.IF.PC + 4
 
 
 class ADDERJTYPE:
@@ -606,13 +1010,19 @@ class ADDERJTYPE:
         self.imm = instruction.imm.value
 
     def get_pc(self, *args, **kwargs):
+        if self.instruction.mnemonic == 'jalr':
+            # rs1 is read before rd is written - rd may be rs1
+            target = (self.registers.read_rf(self.instruction.rs1) + self.imm) & 0xfffffffe
+            self.registers.write_rf(self.rd, self.state.IF.PC + 4)
+            return target
         self.registers.write_rf(self.rd, self.state.IF.PC + 4)
         return self.state.IF.PC + self.imm
 
 
-def get_instruction_class(mnemonic: str):
+def get_instruction_class(mnemonic: str, legacy_lw: bool = True):
+    # legacy_lw - the test programs encode LW with funct3 000, which is LB in RV32I
     try:
-        if mnemonic == "lb":
+        if mnemonic == "lb" and legacy_lw:
             mnemonic = "lw"
         cls = getattr(importlib.import_module('instructions'), mnemonic.upper())
         return cls
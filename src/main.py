@@ -1,8 +1,16 @@
 import argparse
 import os
+import sys
 
+from cosim import CosimMismatch, LockstepCosim
+from debugger import Debugger
 from models import DataMem, InsMem
+from pipeline_config import PipelineConfig
+from rf_history import RFHistorySink
 from rv32i_simulator import SingleStageCore, FiveStageCore
+from superscalar import SuperscalarCore
+from tracing import FileTraceSink, FlightRecorderSink, TraceSink, dump_on_signal
+from verify import TraceMismatch, verifying_tracer, verify_data_mem
 
 
 def main():
@@ -10,8 +18,38 @@ def main():
     parser = argparse.ArgumentParser(description='RV32I processor')
     parser.add_argument('--iodir', default="", type=str, help='Directory containing the input files.')
     parser.add_argument("--testpath", default="", type=str, help="Test Case Path")
+    parser.add_argument("--notrace", action="store_true", help="Skip per-cycle RF / state dumps and console trace.")
+    parser.add_argument("--flight", default=0, type=int,
+                        help="Flight recorder - keep only the last N cycles of trace, written on halt / error / signal.")
+    parser.add_argument("--cosim", action="store_true",
+                        help="Check every FS retirement against SS in lockstep, stop at the first divergence.")
+    parser.add_argument("--verify", default="", type=str,
+                        help="ExpectedResults directory - compare RF traces and DMEM while simulating.")
+    parser.add_argument("--verify-state", action="store_true",
+                        help="Also compare StateResult traces (expected files produced by this simulator).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write per-PC hot spot reports annotated with Code.asm next to imem.txt.")
+    parser.add_argument("--break", dest="breakpoints", default=[], action="append", type=lambda pc: int(pc, 0),
+                        help="Pause before the instruction at PC issues - repeat for more breakpoints.")
+    parser.add_argument("--break-when", default=[], action="append", type=str,
+                        help="Pause when a register condition becomes true, e.g. 'x5==3' - repeatable.")
+    parser.add_argument("--watch", default=[], action="append", type=str,
+                        help="Pause on DMEM access - ADDRESS[:r|w|rw], repeatable.")
+    parser.add_argument("--checkpoint", default="", type=str,
+                        help="Directory - write a checkpoint of the core on every breakpoint hit.")
+    parser.add_argument("--rf-history", action="store_true",
+                        help="Also write the RF of every cycle as a cycles x 32 int32 array, SS_RFHistory.npy / "
+                             "FS_RFHistory.npy - works with --notrace.")
+    parser.add_argument("--dmem-delta", action="store_true",
+                        help="Dump only the DMEM pages the program wrote, each after an @<hex address> line.")
+    parser.add_argument("--lb", action="store_true",
+                        help="Decode loads with funct3 000 as RV32I LB - the test programs use it for LW.")
+    parser.add_argument("--issue-width", default=0, type=int, choices=[1, 2],
+                        help="Also run the superscalar core issuing up to this many instructions per cycle - "
+                             "SC_ result files, metrics appended to PerformanceMetrics_Result.txt.")
     args = parser.parse_args()
     test_case_number = 1
+    config = PipelineConfig(legacy_lw=not args.lb, issue_width=args.issue_width or 1)
 
     ioDir = os.path.abspath(args.iodir)
     ioTest = os.path.abspath(args.testpath)
@@ -23,32 +61,137 @@ def main():
         imem = InsMem("Imem", ioDir, ioTest=ioTest, tc=test_case_number)
         dmem_ss = DataMem("SS", ioDir, ioTest=ioTest, tc=test_case_number)
         dmem_fs = DataMem("FS", ioDir, ioTest=ioTest, tc=test_case_number)
+        dmem_sc = DataMem("SC", ioDir, ioTest=ioTest, tc=test_case_number)
     else:
         imem = InsMem("Imem", ioDir)
         dmem_ss = DataMem("SS", ioDir)
         dmem_fs = DataMem("FS", ioDir)
+        dmem_sc = DataMem("SC", ioDir)
+    # the loaded image is epoch 0 - a delta dump holds the pages written in the epochs started here
+    dmem_epochs = {dmem.id: dmem.new_epoch() for dmem in [dmem_ss, dmem_fs, dmem_sc]} if args.dmem_delta else {}
 
-    ssCore = SingleStageCore(ioDir, imem, dmem_ss)
-    fsCore = FiveStageCore(ioDir, imem, dmem_fs)
+    ss_tracer = fs_tracer = sc_tracer = None
+    recorders = []
+    if args.flight:
+        ss_tracer = FlightRecorderSink(args.flight, ioDir + "/SS_RFResult.txt", ioDir + "/StateResult_SS.txt")
+        fs_tracer = FlightRecorderSink(args.flight, ioDir + "/FS_RFResult.txt", ioDir + "/StateResult_FS.txt")
+        recorders = [ss_tracer, fs_tracer]
+        dump_on_signal(recorders)
+    if args.verify:
+        # traces are compared against the expected files line by line instead of being written
+        ss_tracer = verifying_tracer(args.verify, "SS", state=args.verify_state, inner=ss_tracer)
+        fs_tracer = verifying_tracer(args.verify, "FS", state=args.verify_state, inner=fs_tracer)
+        # SC only when the test case has expected SC results
+        if args.issue_width and os.path.exists(os.path.join(args.verify, "SC_RFResult.txt")):
+            sc_tracer = verifying_tracer(args.verify, "SC", state=args.verify_state)
+    if args.rf_history:
+        # the history sink passes the trace on - the text files are still written unless --notrace
+        if ss_tracer is None:
+            ss_tracer = TraceSink() if args.notrace else \
+                FileTraceSink(ioDir + "/SS_RFResult.txt", ioDir + "/StateResult_SS.txt")
+        if fs_tracer is None:
+            fs_tracer = TraceSink() if args.notrace else \
+                FileTraceSink(ioDir + "/FS_RFResult.txt", ioDir + "/StateResult_FS.txt")
+        ss_tracer = RFHistorySink(ioDir + "/SS_RFHistory.npy", inner=ss_tracer)
+        fs_tracer = RFHistorySink(ioDir + "/FS_RFHistory.npy", inner=fs_tracer)
 
-    while True:
-        if not ssCore.halted:
-            ssCore.step()
+    ssCore = SingleStageCore(ioDir, imem, dmem_ss, trace=not args.notrace, tracer=ss_tracer, config=config)
+    fsCore = FiveStageCore(ioDir, imem, dmem_fs, trace=not args.notrace, tracer=fs_tracer, config=config)
+    # same imem / dmem as the scalar cores - its metrics are directly comparable with FS
+    scCore = SuperscalarCore(ioDir, imem, dmem_sc, trace=not args.notrace, tracer=sc_tracer, config=config) \
+        if args.issue_width else None
 
-        if not fsCore.halted:
-            fsCore.step()
+    if args.profile:
+        ssCore.enable_profile()
+        fsCore.enable_profile()
 
-        if ssCore.halted and fsCore.halted:
-            break
+    def on_hit(debugger, hit):
+        # pause - dump the core, checkpoint it and wait for the user when there is one
+        print("Breakpoint -", hit)
+        print(debugger.dump_state())
+        if args.checkpoint:
+            print("Checkpoint written to", debugger.write_checkpoint(args.checkpoint))
+        if sys.stdin.isatty() and input("[c]ontinue / [q]uit: ").strip().lower().startswith("q"):
+            sys.exit(0)
+
+    for core in [ssCore, fsCore]:
+        debugger = Debugger(core, on_hit)
+        for pc in args.breakpoints:
+            debugger.break_at(pc)
+        for condition in args.break_when:
+            debugger.break_when(condition)
+        for watchpoint in args.watch:
+            address, _, mode = watchpoint.partition(":")
+            debugger.watch(int(address, 0), mode or "rw")
+        debugger.arm()
+
+    cosim = LockstepCosim(ssCore, fsCore) if args.cosim else None
+
+    try:
+        if cosim is not None:
+            cosim.run()
+
+        while True:
+            if not ssCore.halted:
+                ssCore.step()
+
+            if not fsCore.halted:
+                fsCore.step()
+
+            if scCore is not None and not scCore.halted:
+                scCore.step()
+
+            if ssCore.halted and fsCore.halted and (scCore is None or scCore.halted):
+                break
+
+        if args.verify:
+            verify_data_mem(args.verify, dmem_ss, ssCore.cycle)
+            verify_data_mem(args.verify, dmem_fs, fsCore.cycle)
+            if sc_tracer is not None:
+                verify_data_mem(args.verify, dmem_sc, scCore.cycle)
+            print("Verification passed")
+    except CosimMismatch as e:
+        for recorder in recorders:
+            recorder.dump("co-simulation mismatch")
+        print("Co-simulation mismatch -", e)
+        sys.exit(1)
+    except TraceMismatch as e:
+        for recorder in recorders:
+            recorder.dump("verification failed")
+        print("Verification failed -", e)
+        sys.exit(1)
+    except Exception:
+        for recorder in recorders:
+            recorder.dump("error")
+        raise
 
     # dump SS and FS data mem.
-    dmem_ss.output_data_mem()
-    dmem_fs.output_data_mem()
+    dmem_ss.output_data_mem(since=dmem_epochs.get("SS"))
+    dmem_fs.output_data_mem(since=dmem_epochs.get("FS"))
 
     # dumps SS and DS Performance
     ssCore.calculate_performance_metrics()
     fsCore.calculate_performance_metrics()
 
+    # dumps SS and FS execution statistics
+    ssCore.output_stats()
+    fsCore.output_stats()
+
+    # dumps FS CPI stack
+    fsCore.output_cpi_stack()
+
+    # dumps the superscalar core - after FS, its metrics are appended
+    if scCore is not None:
+        dmem_sc.output_data_mem(since=dmem_epochs.get("SC"))
+        scCore.calculate_performance_metrics()
+        scCore.output_stats()
+        scCore.output_cpi_stack()
+
+    # dumps SS and FS hot spots
+    if args.profile:
+        ssCore.output_profile(os.path.join(imem.input_dir, "Code.asm"))
+        fsCore.output_profile(os.path.join(imem.input_dir, "Code.asm"))
+
 
 if __name__ == "__main__":
     # data_mem = DataMem("SS", "data")
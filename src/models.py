@@ -1,13 +1,57 @@
+import copy
 import json
+from array import array
 
 from bitstring import BitArray
 
 
+def load_image(image) -> list:
+    # in-memory program / data image as the byte lines of imem.txt / dmem.txt
+    # bytes - one byte per line, ints - 32-bit words stored MSB first, str - byte lines as read from file
+    if isinstance(image, (bytes, bytearray)):
+        return ['{:08b}'.format(byte) for byte in image]
+    lines = []
+    for word in image:
+        if isinstance(word, str):
+            lines.append(word)
+        else:
+            word = '{:032b}'.format(word & 0xffffffff)
+            lines.extend([word[i: i + 8] for i in range(0, 32, 8)])
+    return lines
+
+
+def read_image(path: str) -> list:
+    # imem.txt / dmem.txt - one byte per line
+    with open(path) as image:
+        return [data.replace("\n", "") for data in image.readlines()]
+
+
+# DMem writes are tracked per page of this many bytes - see DataMem.delta
+PAGE_SIZE = 64
+
+
+def rebuild_image(base: bytes, deltas: list) -> bytes:
+    # full DMem from a base image and the deltas (page -> bytes) written after it, oldest first
+    image = bytearray(base)
+    for delta in deltas:
+        for page, data in delta.items():
+            address = page * PAGE_SIZE
+            if len(image) < address + len(data):
+                image.extend(bytes(address + len(data) - len(image)))
+            image[address: address + len(data)] = data
+    return bytes(image)
+
+
 # TODO: set nop default to false and handle it in init for core class
 class InsMem(object):
 
     def __init__(self, name, io_dir, **kwargs):
         self.id = name
+        self.input_dir = None  # directory of imem.txt - None for in-memory images
+
+        if "image" in kwargs:
+            self.IMem = load_image(kwargs["image"])
+            return
 
         if "ioTest" not in kwargs:
             input_file_path = io_dir
@@ -16,8 +60,8 @@ class InsMem(object):
 
         print(input_file_path)
 
-        with open(input_file_path + "/imem.txt") as im:
-            self.IMem = [data.replace("\n", "") for data in im.readlines()]
+        self.input_dir = input_file_path
+        self.IMem = read_image(input_file_path + "/imem.txt")
 
     def read_instr(self, read_address: int):
         # DONE: Handle word addressing - use nearest lower multiple for 4 for address = x - x % 4
@@ -32,71 +76,135 @@ class DataMem(object):
         self.id = name
         self.io_dir = io_dir
 
-        if "ioTest" not in kwargs:
-            input_file_path = io_dir
+        if "image" in kwargs:
+            self.DMem = load_image(kwargs["image"] or [])
         else:
-            input_file_path = kwargs["ioTest"] + f"/TC{kwargs['tc']}"
-
-        with open(input_file_path + "/dmem.txt") as dm:
-            self.DMem = [data.replace("\n", "") for data in dm.readlines()]
-            self.DMem += ["0" * 8] * (1000 - len(self.DMem))
-
-    def read_data(self, read_address: int) -> int:
+            if "ioTest" not in kwargs:
+                input_file_path = io_dir
+            else:
+                input_file_path = kwargs["ioTest"] + f"/TC{kwargs['tc']}"
+
+            self.DMem = read_image(input_file_path + "/dmem.txt")
+        self.DMem += ["0" * 8] * (1000 - len(self.DMem))
+        self.epoch = 0  # writes are stamped with the current epoch - see new_epoch
+        # epoch of the last write to every page - the initial image counts as written in epoch 0
+        self.page_epochs = array("Q", [0] * self.page_count())
+
+    def read_data(self, read_address: int, size: int = 4, signed: bool = True) -> int:
         # read data memory
-        # return 32-bit signed int value
+        # return the size byte value at the address, sign / zero extended to a python int
 
         # DONE: Handle word addressing - use nearest lower multiple for 4 for address = x - x % 4
-        read_address = read_address - read_address % 4
-        if len(self.DMem) < read_address + 4:
+        # byte / half word loads align to their own size
+        read_address = read_address - read_address % size
+        if len(self.DMem) < read_address + size:
             raise Exception("Data MEM - Out of bound access")
-        return BitArray(bin="".join(self.DMem[read_address: read_address + 4])).int32
+        value = BitArray(bin="".join(self.DMem[read_address: read_address + size]))
+        return value.int if signed else value.uint
 
-    def write_data_mem(self, address: int, write_data: int):
+    def write_data_mem(self, address: int, write_data: int, size: int = 4):
         # write data into byte addressable memory
-        # Assuming data as 32 bit signed integer
+        # Assuming data as 32 bit signed integer - the low size bytes are stored
 
         # Converting from int to bin
 
         # DONE: Handle word addressing - use nearest lower multiple for 4 for address = x - x % 4
-        address = address - address % 4
-        write_data = '{:032b}'.format(write_data & 0xffffffff)
-
-        left, right, zeroes = [], [], []
-
-        if address <= len(self.DMem):
-            left = self.DMem[:address]
-        else:
-            left = self.DMem
-            zeroes = ["0" * 8] * (address - len(self.DMem))
-        if address + 4 <= len(self.DMem):
-            right = self.DMem[address + 4:]
-
-        self.DMem = left + zeroes + [write_data[i: i + 8] for i in range(0, 32, 8)] + right
-
-    def output_data_mem(self):
+        address = address - address % size
+        bits = size * 8
+        write_data = '{:0{}b}'.format(write_data & ((1 << bits) - 1), bits)
+
+        # written in place - stores past the end grow the memory, the gap is zero filled
+        if len(self.DMem) < address + size:
+            self.DMem.extend(["0" * 8] * (address + size - len(self.DMem)))
+        self.DMem[address: address + size] = [write_data[i: i + 8] for i in range(0, bits, 8)]
+        self.mark_dirty(address, size)
+
+    def page_count(self) -> int:
+        return (len(self.DMem) + PAGE_SIZE - 1) // PAGE_SIZE
+
+    def mark_dirty(self, address: int, length: int):
+        # pages added by growing the memory are new in this epoch as well
+        if len(self.page_epochs) < self.page_count():
+            self.page_epochs.extend([self.epoch] * (self.page_count() - len(self.page_epochs)))
+        for page in range(address // PAGE_SIZE, (address + length - 1) // PAGE_SIZE + 1):
+            self.page_epochs[page] = self.epoch
+
+    def new_epoch(self) -> int:
+        # start an epoch - delta(epoch) then holds the pages written from now on
+        self.epoch += 1
+        return self.epoch
+
+    def dirty_pages(self, since: int) -> list:
+        return [page for page, epoch in enumerate(self.page_epochs) if epoch >= since]
+
+    def page_bytes(self, page: int) -> bytes:
+        return bytes([int(data, 2) for data in self.DMem[page * PAGE_SIZE: (page + 1) * PAGE_SIZE]])
+
+    def delta(self, since: int) -> dict:
+        # page -> bytes of every page written since the epoch began, delta(0) is the whole memory.
+        # rebuild_image(base, [delta]) gives the memory back.
+        return {page: self.page_bytes(page) for page in self.dirty_pages(since)}
+
+    def restore(self, image: bytes):
+        # replace the whole memory - every page counts as written
+        self.DMem = load_image(image)
+        self.page_epochs = array("Q", [self.epoch] * self.page_count())
+
+    def to_bytes(self) -> bytes:
+        return bytes([int(data, 2) for data in self.DMem])
+
+    def output_data_mem(self, since: int = None):
+        # since - only the pages written since that epoch, each after an "@<hex address>" line
         if self.id == 'SS':
             res_path = self.io_dir + "/" + self.id + "_DMEMResult.txt"
         else:
             res_path = self.io_dir + "/" + self.id + "_DMEMResult.txt"
         with open(res_path, "w") as rp:
-            rp.writelines([str(data) + "\n" for data in self.DMem])
+            if since is None:
+                rp.writelines([str(data) + "\n" for data in self.DMem])
+                return
+            for page in self.dirty_pages(since):
+                rp.write("@{:x}\n".format(page * PAGE_SIZE))
+                rp.writelines([str(data) + "\n" for data in self.DMem[page * PAGE_SIZE: (page + 1) * PAGE_SIZE]])
+
+
+def to_int32(value: int) -> int:
+    # 32-bit two's complement wraparound
+    return ((value + 0x80000000) & 0xffffffff) - 0x80000000
 
 
 class RegisterFile(object):
     def __init__(self, io_dir):
         self.output_file = io_dir + "RFResult.txt"
-        self.registers = [0x0 for _ in range(32)]
+        self.registers = array("i", [0] * 32)  # signed 32-bit registers, written values wrap around
+        self.dump_rows = ['{:032b}'.format(0) + "\n"] * 32  # formatted registers of the last RF dump
+        self.dirty = 0  # bitmask - registers written since the last RF dump
 
     def read_rf(self, reg_addr: int) -> int:
         return self.registers[reg_addr]
 
     def write_rf(self, reg_addr: int, wrt_reg_data: int):
         if reg_addr != 0:
-            self.registers[reg_addr] = wrt_reg_data
+            self.registers[reg_addr] = to_int32(wrt_reg_data)
+            self.dirty |= 1 << reg_addr
+
+    def view(self) -> memoryview:
+        # zero-copy read-only view of the registers - only valid until the next write, copy to keep it
+        return memoryview(self.registers).toreadonly()
+
+    def dump_rf(self, cycle) -> list:
+        # only the rows of registers written since the previous dump are formatted again
+        if self.dirty:
+            for reg_addr in range(1, 32):
+                if self.dirty >> reg_addr & 1:
+                    self.dump_rows[reg_addr] = '{:032b}'.format(self.registers[reg_addr] & 0xffffffff) + "\n"
+            self.dirty = 0
+        op = ["State of RF after executing cycle:\t" + str(cycle) + "\n"]
+        op.extend(self.dump_rows)
+        return op
 
     def output_rf(self, cycle):
-        op = ["State of RF after executing cycle:\t" + str(cycle) + "\n"]
-        op.extend(['{:032b}'.format(val & 0xffffffff) + "\n" for val in self.registers])
+        op = self.dump_rf(cycle)
         if cycle == 0:
             perm = "w"
         else:
@@ -206,6 +314,17 @@ class State(object):
 
         self.WB = WBState()
 
+    def copy(self):
+        # latch-wise copy used to end a cycle - instruction objects are shared between the copies,
+        # they are rebound to the current state / nextState on every stage call
+        state = State.__new__(State)
+        state.IF = copy.copy(self.IF)
+        state.ID = copy.copy(self.ID)
+        state.EX = copy.copy(self.EX)
+        state.MEM = copy.copy(self.MEM)
+        state.WB = copy.copy(self.WB)
+        return state
+
     def nop_init(self):
         self.IF.nop = False
         self.ID.nop = True
@@ -0,0 +1,187 @@
+import argparse
+import multiprocessing
+import os
+import struct
+import threading
+from array import array
+from multiprocessing import shared_memory
+
+from models import PAGE_SIZE, DataMem, InsMem, load_image, read_image
+from rv32i_simulator import FiveStageCore, MemSize, format_performance_metrics
+
+# hart id is handed to every hart in a0 before the first cycle - the program branches on it
+HART_ID_REGISTER = 10
+# unsigned struct format of a size byte access, the lower case format is the signed one
+STRUCT_FORMATS = {1: ">B", 2: ">H", 4: ">I"}
+
+
+class SharedDataMem(DataMem):
+    # DMem placed in a shared memory segment - every hart attaches its own instance to the same segment.
+    # Words are stored MSB first, as in dmem.txt.
+
+    def __init__(self, name: str, io_dir: str, segment: str):
+        self.id = name
+        self.io_dir = io_dir
+        self.shm = shared_memory.SharedMemory(name=segment)
+        self.buffer = self.shm.buf
+        self.epoch = 0  # dirty pages are tracked per hart - stores of the other harts are not seen
+        self.page_epochs = array("Q", [0] * self.page_count())
+
+    @classmethod
+    def create(cls, image) -> shared_memory.SharedMemory:
+        # new segment holding the data image padded to MemSize - the creator unlinks it when done
+        image = bytes([int(data, 2) for data in load_image(image or [])])
+        shm = shared_memory.SharedMemory(create=True, size=max(MemSize, len(image)))
+        shm.buf[:len(image)] = image
+        shm.buf[len(image):] = bytes(shm.size - len(image))
+        return shm
+
+    @property
+    def DMem(self) -> list:
+        return ['{:08b}'.format(byte) for byte in self.buffer]
+
+    def read_data(self, read_address: int, size: int = 4, signed: bool = True) -> int:
+        read_address = read_address - read_address % size
+        if len(self.buffer) < read_address + size:
+            raise Exception("Data MEM - Out of bound access")
+        fmt = STRUCT_FORMATS[size]
+        return struct.unpack_from(fmt.lower() if signed else fmt, self.buffer, read_address)[0]
+
+    def write_data_mem(self, address: int, write_data: int, size: int = 4):
+        # the segment cannot grow - unlike DataMem, writes past the end are an error
+        address = address - address % size
+        if len(self.buffer) < address + size:
+            raise Exception("Data MEM - Out of bound access")
+        struct.pack_into(STRUCT_FORMATS[size], self.buffer, address, write_data & ((1 << size * 8) - 1))
+        self.mark_dirty(address, size)
+
+    def page_count(self) -> int:
+        return (len(self.buffer) + PAGE_SIZE - 1) // PAGE_SIZE
+
+    def page_bytes(self, page: int) -> bytes:
+        return bytes(self.buffer[page * PAGE_SIZE: (page + 1) * PAGE_SIZE])
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.buffer)
+
+    def close(self):
+        self.buffer.release()
+        self.shm.close()
+
+
+def run_hart(hart_id: int, program: list, segment: str, barrier, halted, quantum: int, io_dir: str, trace: bool,
+             results):
+    # one hart per host process - harts run `quantum` cycles between barriers. Stores become visible to the other
+    # harts immediately, but only programs which do not race within a quantum are deterministic.
+    dmem = SharedDataMem("FS", io_dir, segment)
+    try:
+        hart_dir = os.path.join(io_dir, f"hart{hart_id}")
+        if trace:
+            os.makedirs(hart_dir, exist_ok=True)
+        core = FiveStageCore(hart_dir, InsMem("Imem", "", image=program), dmem, trace=trace)
+        core.myRF.write_rf(HART_ID_REGISTER, hart_id)
+
+        while True:
+            for _ in range(quantum):
+                if core.halted:
+                    break
+                core.step()
+            halted[hart_id] = core.halted
+            barrier.wait()
+            # every hart decides on the same flags - nobody may move on before all of them have read them
+            done = all(halted)
+            barrier.wait()
+            if done:
+                break
+
+        results.put({"hart": hart_id, "metrics": core.performance_metrics(), "registers": list(core.myRF.registers),
+                     "stats": core.stats.to_dict()})
+    except threading.BrokenBarrierError:
+        results.put({"hart": hart_id, "error": "stopped - another hart failed"})
+    except Exception as e:
+        barrier.abort()
+        results.put({"hart": hart_id, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        dmem.close()
+
+
+def aggregate_metrics(harts: list) -> dict:
+    # harts run in parallel - the machine takes as long as the slowest hart and retires all instructions
+    cycles = max([hart["metrics"]["cycles"] for hart in harts])
+    instructions = sum([hart["metrics"]["instructions"] for hart in harts])
+    return {"cycles": cycles, "instructions": instructions, "cpi": float(cycles) / instructions,
+            "ipc": float(instructions) / cycles}
+
+
+class MultiHartSimulator(object):
+
+    def __init__(self, program, data=None, harts: int = 2, quantum: int = 1, io_dir: str = "", trace: bool = False):
+        # program / data - see models.load_image, quantum - cycles every hart runs between barriers
+        self.program = load_image(program)
+        self.data = data
+        self.harts = harts
+        self.quantum = quantum
+        self.io_dir = io_dir
+        self.trace = trace
+
+    def run(self):
+        # returns (per-hart results ordered by hart id, final DMem bytes)
+        shm = SharedDataMem.create(self.data)
+        try:
+            barrier = multiprocessing.Barrier(self.harts)
+            halted = multiprocessing.Array("b", self.harts, lock=False)
+            results = multiprocessing.Queue()
+            processes = [multiprocessing.Process(target=run_hart,
+                                                 args=(hart_id, self.program, shm.name, barrier, halted, self.quantum,
+                                                       self.io_dir, self.trace, results))
+                         for hart_id in range(self.harts)]
+            for process in processes:
+                process.start()
+            harts = sorted([results.get() for _ in processes], key=lambda hart: hart["hart"])
+            for process in processes:
+                process.join()
+
+            errors = [f"hart {hart['hart']}: {hart['error']}" for hart in harts if "error" in hart]
+            if errors:
+                raise Exception("Multi-hart simulation failed - " + "; ".join(errors))
+            return harts, bytes(shm.buf)
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+def output_results(io_dir: str, harts: list, memory: bytes):
+    with open(os.path.join(io_dir, "MH_DMEMResult.txt"), "w") as rp:
+        rp.writelines(['{:08b}'.format(byte) + "\n" for byte in memory])
+    with open(os.path.join(io_dir, "MH_RFResult.txt"), "w") as rp:
+        for hart in harts:
+            rp.write("State of RF of hart:\t" + str(hart["hart"]) + "\n")
+            rp.writelines(['{:032b}'.format(val & 0xffffffff) + "\n" for val in hart["registers"]])
+    with open(os.path.join(io_dir, "MH_PerformanceMetrics_Result.txt"), "w") as rp:
+        for hart in harts:
+            rp.write(format_performance_metrics(f"Hart {hart['hart']} Five Stage", hart["metrics"]))
+        rp.write(format_performance_metrics(f"{len(harts)}-Hart Aggregate", aggregate_metrics(harts)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RV32I multi-hart processor')
+    parser.add_argument('--iodir', default="", type=str, help='Directory containing the input files.')
+    parser.add_argument("--harts", default=2, type=int, help="Number of harts, each simulated in its own process.")
+    parser.add_argument("--quantum", default=1, type=int, help="Cycles every hart runs between barriers.")
+    parser.add_argument("--trace", action="store_true", help="Write per-cycle RF / state dumps to hart<N>/.")
+    args = parser.parse_args()
+
+    io_dir = os.path.abspath(args.iodir)
+    harts, memory = MultiHartSimulator(read_image(os.path.join(io_dir, "imem.txt")),
+                                       read_image(os.path.join(io_dir, "dmem.txt")),
+                                       harts=args.harts, quantum=args.quantum, io_dir=io_dir, trace=args.trace).run()
+    output_results(io_dir, harts, memory)
+
+    for hart in harts:
+        print(f"Hart {hart['hart']}: {hart['metrics']['cycles']} cycles, CPI {hart['metrics']['cpi']}")
+    aggregate = aggregate_metrics(harts)
+    print(f"Aggregate: {aggregate['cycles']} cycles, CPI {aggregate['cpi']}, IPC {aggregate['ipc']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+BRANCH_RESOLUTION_STAGES = ["ID", "EX"]
+# instructions issued per cycle - only the superscalar core issues more than one
+ISSUE_WIDTHS = [1, 2]
+
+
+class PipelineConfig(object):
+    # microarchitectural knobs of the five stage pipeline - the defaults are the classic core
+
+    def __init__(self, forwarding: bool = True, branch_resolution: str = "ID", memory_latency: int = 1,
+                 instruction_cap: int = 0, legacy_lw: bool = True, issue_width: int = 1):
+        if branch_resolution not in BRANCH_RESOLUTION_STAGES:
+            raise Exception(f"Invalid branch resolution stage - {branch_resolution}")
+        if memory_latency < 1:
+            raise Exception("Memory latency must be at least one cycle")
+        if issue_width not in ISSUE_WIDTHS:
+            raise Exception(f"Invalid issue width - {issue_width}")
+        self.forwarding = forwarding  # Flag - EX / MEM results are bypassed to ID, else dependents wait for WB
+        self.branch_resolution = branch_resolution  # stage where branches are decided - ID: 1 squashed slot, EX: 2
+        self.memory_latency = memory_latency  # cycles a load / store spends in MEM, the stages behind it wait
+        self.instruction_cap = instruction_cap  # stop fetching after this many instructions, 0 - no cap
+        self.legacy_lw = legacy_lw  # Flag - funct3 000 loads decode as LW (test programs), else as RV32I LB
+        self.issue_width = issue_width  # instructions the superscalar core issues per cycle, FS always issues one
+
+    def to_dict(self) -> dict:
+        return {
+            "forwarding": self.forwarding,
+            "branch_resolution": self.branch_resolution,
+            "memory_latency": self.memory_latency,
+            "instruction_cap": self.instruction_cap,
+            "legacy_lw": self.legacy_lw,
+            "issue_width": self.issue_width
+        }
+
+    @classmethod
+    def from_dict(cls, config: dict):
+        return cls(**config)
+
+    def label(self) -> str:
+        return f"fwd={'on' if self.forwarding else 'off'} br={self.branch_resolution} mem={self.memory_latency}" \
+               f"{f' cap={self.instruction_cap}' if self.instruction_cap else ''}" \
+               f"{'' if self.legacy_lw else ' lb'}{f' width={self.issue_width}' if self.issue_width > 1 else ''}"
+
+    def __repr__(self):
+        return f"PipelineConfig({self.label()})"
+
+
+DEFAULT_CONFIG = PipelineConfig()
@@ -0,0 +1,89 @@
+import os
+import re
+from array import array
+
+from stats import STALL_CLASSES
+
+# cycles which belong to no instruction - pipeline fill before the first decode, drain after HALT is fetched
+PIPELINE_CLASSES = ["fill", "drain"]
+
+SOURCE_LINE = re.compile(r"^\s*(\d+)\s*:\s*(.*?)\s*$")
+
+
+class HotSpotProfile(object):
+    # per-PC attribution of simulated cycles - every cycle of a core lands in exactly one counter:
+    #   base           -> PC of the instruction issued (decoded in FS) in the cycle
+    #   stalls         -> PC of the instruction held in ID, of the load / store held in MEM
+    #   control_flush  -> PC of the taken branch / jump which squashed the slot
+    #   fill / drain   -> pipeline
+    # counters are preallocated so that recording a cycle never allocates
+
+    def __init__(self, pc_slots: int):
+        self.cycles = array("Q", [0] * pc_slots)  # all cycles attributed to PC (PC // 4)
+        self.stalls = array("Q", [0] * pc_slots)  # stall cycles of the instruction
+        self.flushes = array("Q", [0] * pc_slots)  # squashed slots caused by the branch / jump
+        self.pipeline = array("Q", [0] * len(PIPELINE_CLASSES))
+
+    def record_cycle(self, cycle_class: str, pc: int, cycles: int = 1):
+        if cycle_class == "base":
+            self.cycles[pc >> 2] += cycles
+        elif cycle_class in STALL_CLASSES:
+            self.cycles[pc >> 2] += cycles
+            self.stalls[pc >> 2] += cycles
+        elif cycle_class == "control_flush":
+            self.cycles[pc >> 2] += cycles
+            self.flushes[pc >> 2] += cycles
+        else:
+            self.pipeline[PIPELINE_CLASSES.index(cycle_class)] += cycles
+
+    def total_cycles(self) -> int:
+        return sum(self.cycles) + sum(self.pipeline)
+
+    def hot_spots(self, instruction_counts) -> list:
+        # (pc, cycles, instructions, stalls, flushes) of every PC which took a cycle, hottest first
+        rows = [(slot << 2, cycles, instruction_counts[slot], self.stalls[slot], self.flushes[slot])
+                for slot, cycles in enumerate(self.cycles) if cycles]
+        return sorted(rows, key=lambda row: (-row[1], row[0]))
+
+
+def read_source(path: str) -> dict:
+    # PC -> source line of a Code.asm listing. Lines are "PC: text"; listings without PC prefixes are numbered in
+    # order. Comment blocks (the binary dump at the end) are skipped.
+    if not os.path.exists(path):
+        return {}
+    numbered, plain = {}, []
+    in_comment = False
+    with open(path) as source:
+        for line in source:
+            text = line.strip()
+            if in_comment or text.startswith("/*"):
+                in_comment = "*/" not in text
+                continue
+            if not text:
+                continue
+            match = SOURCE_LINE.match(text)
+            if match:
+                numbered[int(match.group(1))] = match.group(2)
+            else:
+                plain.append(text)
+    return numbered if numbered else {pc * 4: text for pc, text in enumerate(plain)}
+
+
+def format_profile(name: str, profile: HotSpotProfile, instruction_counts, source: dict) -> list:
+    total = profile.total_cycles()
+    op = [f"{name} Core Hot Spots-----------------------------\n",
+          f"{'PC':>6} {'cycles':>8} {'%':>6} {'instrs':>8} {'stalls':>8} {'flushes':>8}  source\n"]
+    for pc, cycles, count, stalls, flushes in profile.hot_spots(instruction_counts):
+        op.append(f"{pc:>6} {cycles:>8} {100.0 * cycles / total:>6.2f} {count:>8} {stalls:>8} {flushes:>8}  "
+                  f"{source.get(pc, '')}\n")
+    for key, cycles in zip(PIPELINE_CLASSES, profile.pipeline):
+        if cycles:
+            op.append(f"{'--':>6} {cycles:>8} {100.0 * cycles / total:>6.2f} {'':>8} {'':>8} {'':>8}  "
+                      f"pipeline {key}\n")
+    op.append(f"Total cycles: {total}\n")
+    return op
+
+
+def output_profile(res_path: str, name: str, profile: HotSpotProfile, instruction_counts, source_path: str):
+    with open(res_path, "w") as rp:
+        rp.writelines(format_profile(name, profile, instruction_counts, read_source(source_path)))
@@ -0,0 +1,114 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from models import load_image
+
+# simulator version - digest of the sources a result depends on, any change to them invalidates the cache
+SOURCES = ["instructions.py", "models.py", "pipeline_config.py", "profiler.py", "rv32i_simulator.py", "simulator.py",
+           "stats.py", "superscalar.py", "tracing.py"]
+
+
+def simulator_version() -> str:
+    digest = hashlib.sha256()
+    for source in SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source), "rb") as src:
+            digest.update(src.read())
+    return digest.hexdigest()
+
+
+SIMULATOR_VERSION = simulator_version()
+# a process scans the directory once it has put max_bytes / RESCAN_FRACTION since its last scan - puts in between take
+# no lock and stat nothing. Eviction goes down to max_bytes less that much, so the next scan is as far away again. With
+# N processes the directory overshoots the limit by at most N * max_bytes / RESCAN_FRACTION
+RESCAN_FRACTION = 8
+# temporary files left by puts that died before the rename - eviction deletes the older ones, younger ones may still
+# be written by another process
+STALE_TMP_SECONDS = 3600
+
+
+class ResultCache(object):
+    # disk-backed SimulationResult dicts keyed by a hash of program, data, simulator version and options
+    # entries are written to a temporary file and renamed into place, so readers in other processes never see
+    # a partial entry - eviction is serialised with a lock file, least recently used (mtime) entries go first
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_bytes = max_bytes // RESCAN_FRACTION
+        self.written_bytes = self.rescan_bytes  # put since the last scan - starts at the threshold, the first put scans
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, program, data, **options) -> str:
+        digest = hashlib.sha256()
+        digest.update(SIMULATOR_VERSION.encode())
+        digest.update("\n".join(load_image(program)).encode() + b"\0")
+        digest.update("\n".join(load_image(data or [])).encode() + b"\0")
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key: str):
+        path = self.path(key)
+        try:
+            with open(path) as entry:
+                result = json.load(entry)
+            os.utime(path)  # most recently used
+        except (OSError, ValueError):
+            # missing, or evicted by another process in between
+            return None
+        return result
+
+    def put(self, key: str, result: dict):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as entry:
+            json.dump(result, entry)
+            size = entry.tell()
+        os.replace(tmp_path, path)
+        self.written_bytes += size
+        if self.written_bytes >= self.rescan_bytes:
+            self.evict()
+
+    def scan(self):
+        # (entries as (mtime, size, path), temporary files older than STALE_TMP_SECONDS)
+        entries, stale = [], []
+        stale_before = time.time() - STALE_TMP_SECONDS
+        for sub_dir in os.scandir(self.directory):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(".json"):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                elif entry.name.endswith(".tmp") and stat.st_mtime < stale_before:
+                    stale.append(entry.path)
+        return entries, stale
+
+    def evict(self):
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries, stale = self.scan()
+            entries.sort()
+            total = sum([size for _, size, _ in entries])
+            victims = stale
+            for _, size, path in entries:
+                if total <= self.max_bytes - self.rescan_bytes:
+                    break
+                victims.append(path)
+                total -= size
+            for path in victims:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        self.written_bytes = 0
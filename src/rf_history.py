@@ -0,0 +1,150 @@
+import argparse
+import struct
+import sys
+
+from debugger import CONDITION, OPERATORS
+from models import RegisterFile
+from tracing import TraceSink
+
+REGISTERS = 32
+# .npy format 1.0 - magic, header length, header dict padded to a fixed size so it can be rewritten in place once the
+# number of cycles is known
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+HEADER_SIZE = 128
+
+
+def npy_header(cycles: int) -> bytes:
+    header = "{'descr': '<i4', 'fortran_order': False, 'shape': (%d, %d), }" % (cycles, REGISTERS)
+    header = header.ljust(HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + "\n"
+    return NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def require_numpy():
+    # NumPy is only needed to query a history - writing one works without it
+    try:
+        import numpy
+    except ImportError:
+        raise Exception("RF history queries need NumPy - pip install numpy")
+    return numpy
+
+
+class RFHistorySink(TraceSink):
+    # RF after every cycle as one little-endian int32 row of a cycles x 32 .npy array - passes everything on to inner
+
+    def __init__(self, path: str, inner: TraceSink = None):
+        self.path = path
+        self.inner = inner if inner is not None else TraceSink()
+        self.file = open(path, "wb")
+        self.file.write(npy_header(0))
+        self.cycles = 0
+
+    def console(self, line: str):
+        self.inner.console(line)
+
+    def rf(self, cycle: int, registers: RegisterFile):
+        if sys.byteorder == "little":
+            self.file.write(registers.registers)
+        else:
+            row = registers.registers[:]
+            row.byteswap()
+            self.file.write(row)
+        self.cycles += 1
+        self.inner.rf(cycle, registers)
+
+    def state(self, cycle: int, text: str):
+        self.inner.state(cycle, text)
+
+    def memory(self, cycle: int, memory):
+        self.inner.memory(cycle, memory)
+
+    def close(self):
+        if self.file is not None:
+            self.file.seek(0)
+            self.file.write(npy_header(self.cycles))
+            self.file.close()
+            self.file = None
+        self.inner.close()
+
+
+class RFHistory(object):
+    # memory-mapped RF history written by RFHistorySink - rows are cycles, columns registers x0 - x31
+
+    def __init__(self, path: str):
+        self.np = require_numpy()
+        self.path = path
+        self.history = self.np.load(path, mmap_mode="r")
+
+    def __len__(self):
+        return self.history.shape[0]
+
+    def value(self, register: int, cycle: int) -> int:
+        # x<register> after the cycle
+        return int(self.history[cycle, register])
+
+    def changes(self, register: int) -> list:
+        # cycles whose write changed x<register> - registers start at zero
+        column = self.history[:, register]
+        changed = column[1:] != column[:-1]
+        cycles = self.np.flatnonzero(changed) + 1
+        if len(column) and column[0] != 0:
+            cycles = self.np.concatenate([[0], cycles])
+        return cycles.tolist()
+
+    def values(self, register: int) -> list:
+        # successive values x<register> took - independent of timing, comparable between SS and FS
+        return [0] + self.history[self.changes(register), register].tolist()
+
+    def first_where(self, condition: str):
+        # first cycle after which a register condition holds, e.g. "x5 < 0", None if it never does
+        match = CONDITION.match(condition)
+        if not match:
+            raise Exception(f"Invalid register condition - {condition}")
+        register, op, value = int(match.group(1)), match.group(2), int(match.group(3), 0)
+        held = OPERATORS[op](self.history[:, register], value)
+        cycle = int(self.np.argmax(held)) if len(held) else 0
+        return cycle if len(held) and held[cycle] else None
+
+
+def diff(first: RFHistory, second: RFHistory) -> tuple:
+    # (cycles, registers) - index arrays of the registers differing in the same cycle, over the cycles both
+    # histories have
+    cycles = min(len(first), len(second))
+    return first.np.nonzero(first.history[:cycles] != second.history[:cycles])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RV32I register file history queries')
+    parser.add_argument("history", type=str, help="SS_RFHistory.npy / FS_RFHistory.npy")
+    parser.add_argument("--value", nargs=2, type=int, metavar=("REGISTER", "CYCLE"), help="x<REGISTER> after CYCLE.")
+    parser.add_argument("--changes", type=int, metavar="REGISTER", help="Cycles where x<REGISTER> changed.")
+    parser.add_argument("--first", type=str, metavar="CONDITION", help="First cycle a condition holds, e.g. 'x5<0'.")
+    parser.add_argument("--diff", type=str, metavar="HISTORY", help="Registers differing from another history.")
+    parser.add_argument("--values", action="store_true",
+                        help="With --diff, compare the successive values of every register instead of cycles.")
+    args = parser.parse_args()
+
+    history = RFHistory(args.history)
+    print(f"{args.history}: {len(history)} cycles")
+    if args.value:
+        register, cycle = args.value
+        print(f"x{register} after cycle {cycle}: {history.value(register, cycle)}")
+    if args.changes is not None:
+        print(f"x{args.changes} changed in cycles: {history.changes(args.changes)}")
+    if args.first:
+        cycle = history.first_where(args.first)
+        print(f"{args.first}: " + ("never" if cycle is None else f"first after cycle {cycle}"))
+    if args.diff:
+        other = RFHistory(args.diff)
+        if args.values:
+            differing = [register for register in range(REGISTERS)
+                         if history.values(register) != other.values(register)]
+            print(f"registers with different value sequences: {differing or 'none'}")
+        else:
+            cycles, registers = diff(history, other)
+            for cycle, register in list(zip(cycles.tolist(), registers.tolist()))[:20]:
+                print(f"cycle {cycle}: x{register} {history.value(register, cycle)} / {other.value(register, cycle)}")
+            print(f"{len(cycles)} differences")
+
+
+if __name__ == "__main__":
+    main()
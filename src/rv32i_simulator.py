@@ -1,18 +1,30 @@
-import copy
-
 from riscvmodel.code import decode, MachineDecodeError
 from riscvmodel.isa import Instruction
 
 from instructions import get_instruction_class, InstructionBase, ADDERBTYPE, ADDERJTYPE
 from models import InsMem, DataMem, RegisterFile, State
+from pipeline_config import PipelineConfig
+from profiler import HotSpotProfile, output_profile
+from stats import ExecutionStats
+from tracing import TraceSink, FileTraceSink
 
 # memory size, in reality, the memory size should be 2^32, but for this lab, for the space reason
 # we keep it as this large number, but the memory is still 32-bit addressable.
 MemSize = 1000
+# ecall / ebreak - compiled programs exit with an ecall, there is no environment to trap to, so both end the run
+ENVIRONMENT_CALLS = ["{:032b}".format(0x00000073), "{:032b}".format(0x00100073)]
+
+
+def format_performance_metrics(stages: str, metrics: dict) -> str:
+    return f"{stages} Core Performance Metrics-----------------------------\n" \
+           f"Number of cycles taken: {metrics['cycles']}\n" \
+           f"Cycles per instruction: {metrics['cpi']}\n" \
+           f"Instructions per cycle: {metrics['ipc']}\n"
 
 
 class Core(object):
-    def __init__(self, ioDir: str, imem: InsMem, dmem: DataMem):
+    def __init__(self, ioDir: str, imem: InsMem, dmem: DataMem, trace: bool = True, tracer: TraceSink = None,
+                 config: PipelineConfig = None):
         self.myRF = RegisterFile(ioDir)
         self.cycle = 0
         self.halted = False
@@ -23,31 +35,69 @@ class Core(object):
         self.nextState.nop_init()
         self.ext_imem: InsMem = imem
         self.ext_dmem: DataMem = dmem
-
-    def calculate_performance_metrics(self):
+        self.stats = ExecutionStats(len(imem.IMem) // 4)
+        self.trace = trace or tracer is not None  # Flag - emit per-cycle console lines, RF and state dumps
+        self.tracer = tracer  # TraceSink - set up by the subclass when not given
+        self.profile = None  # HotSpotProfile - per-PC cycle attribution, see enable_profile
+        self.config = config or PipelineConfig()  # microarchitectural knobs, SS only honours the instruction cap
+
+    def fetch(self, pc: int, instruction_count: int) -> str:
+        # instruction word at pc - the HALT word once config.instruction_cap instructions were fetched, and for
+        # ecall / ebreak, which retire as HALT
+        if self.config.instruction_cap and instruction_count >= self.config.instruction_cap:
+            return "1" * 32
+        instruction_bytes = self.ext_imem.read_instr(pc)
+        if instruction_bytes in ENVIRONMENT_CALLS:
+            return "1" * 32
+        return instruction_bytes
+
+    def performance_metrics(self) -> dict:
         cpi = float(self.cycle) / self.state.IF.instruction_count
-        ipc = 1 / cpi
+        return {
+            "cycles": self.cycle,
+            "instructions": self.state.IF.instruction_count,
+            "cpi": cpi,
+            "ipc": 1 / cpi
+        }
 
-        result_format = f"{self.stages} Core Performance Metrics-----------------------------\n" \
-                        f"Number of cycles taken: {self.cycle}\n" \
-                        f"Cycles per instruction: {cpi}\n" \
-                        f"Instructions per cycle: {ipc}\n"
+    def calculate_performance_metrics(self):
+        result_format = format_performance_metrics(self.stages, self.performance_metrics())
 
         write_mode = "w" if self.stages == "Single Stage" else "a"
 
         with open(self.ioDir[:-3] + "PerformanceMetrics_Result.txt", write_mode) as file:
             file.write(result_format)
 
+    def enable_profile(self):
+        self.profile = HotSpotProfile(len(self.ext_imem.IMem) // 4)
+
+    def output_profile(self, source_path: str):
+        # hot spot report - PCs joined to the lines of source_path (Code.asm) when it exists
+        output_profile(self.ioDir + "ProfileResult.txt", self.stages, self.profile, self.stats.pc_counts, source_path)
+
+    def output_stats(self, **extra):
+        # detailed execution statistics - written next to PerformanceMetrics_Result.txt
+        metrics = self.performance_metrics()
+        self.stats.output_stats(self.ioDir + "PerformanceStats.json",
+                                core=self.stages,
+                                cycles=metrics["cycles"],
+                                instructions=metrics["instructions"],
+                                cpi=metrics["cpi"],
+                                **extra)
+
 
 class SingleStageCore(Core):
-    def __init__(self, io_dir: str, imem: InsMem, dmem: DataMem):
-        super(SingleStageCore, self).__init__(io_dir + "/SS_", imem, dmem)
+    def __init__(self, io_dir: str, imem: InsMem, dmem: DataMem, trace: bool = True, tracer: TraceSink = None,
+                 config: PipelineConfig = None):
+        super(SingleStageCore, self).__init__(io_dir + "/SS_", imem, dmem, trace, tracer, config)
         self.opFilePath = io_dir + "/StateResult_SS.txt"
         self.stages = "Single Stage"
+        if self.tracer is None:
+            self.tracer = FileTraceSink(self.myRF.output_file, self.opFilePath) if trace else TraceSink()
 
     def step(self):
         # IF
-        instruction_bytes = self.ext_imem.read_instr(self.state.IF.PC)
+        instruction_bytes = self.fetch(self.state.IF.PC, self.state.IF.instruction_count)
         if instruction_bytes == "1" * 32:
             self.nextState.IF.nop = True
         else:
@@ -57,15 +107,16 @@ class SingleStageCore(Core):
         try:
             # ID
             instruction: Instruction = decode(int(instruction_bytes, 2))
-            if instruction.mnemonic in ['beq', 'bne']:
+            cls = get_instruction_class(instruction.mnemonic, self.config.legacy_lw)
+            self.stats.record_instruction(self.state.IF.PC, cls.category)
+            if cls.category == "B":
                 self.nextState.IF.PC = ADDERBTYPE(instruction, self.state, self.myRF).get_pc()
-            elif instruction.mnemonic == 'jal':
+            elif instruction.mnemonic in ['jal', 'jalr']:
                 self.nextState.IF.PC = ADDERJTYPE(instruction, self.state, self.myRF).get_pc()
             else:
-                instruction_ob: InstructionBase = get_instruction_class(instruction.mnemonic)(instruction,
-                                                                                              self.ext_dmem, self.myRF,
-                                                                                              self.state,
-                                                                                              self.nextState)
+                instruction_ob: InstructionBase = cls(instruction, self.ext_dmem, self.myRF, self.state,
+                                                      self.nextState)
+                instruction_ob.pc = self.state.IF.PC
                 # Ex
                 alu_result = instruction_ob.execute()
                 # Load/Store (MEM)
@@ -82,12 +133,18 @@ class SingleStageCore(Core):
             self.nextState.IF.instruction_count = self.nextState.IF.instruction_count + 1
             self.halted = True
 
-        self.myRF.output_rf(self.cycle)  # dump RF
-        self.printState(self.nextState, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
+        if self.profile is not None:
+            self.profile.record_cycle("base", self.state.IF.PC)
+
+        if self.trace:
+            self.tracer.rf(self.cycle, self.myRF)  # dump RF
+            self.tracer.memory(self.cycle, self.ext_dmem)
+            self.printState(self.nextState, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
+            if self.halted:
+                self.tracer.close()
 
         # The end of the cycle and updates the current state with the values calculated in this cycle
-        self.state = copy.deepcopy(self.nextState)
-        # self.nextState = copy.deepcopy(self.nextState)
+        self.state = self.nextState.copy()
         self.cycle += 1
 
     def printState(self, state, cycle):
@@ -95,34 +152,43 @@ class SingleStageCore(Core):
         printstate.append("IF.PC: " + str(state.IF.PC) + "\n")
         printstate.append("IF.nop: " + str(state.IF.nop) + "\n")
 
-        if (cycle == 0):
-            perm = "w"
-        else:
-            perm = "a"
-        with open(self.opFilePath, perm) as wf:
-            wf.writelines(printstate)
+        self.tracer.state(cycle, "".join(printstate))
 
 
 class FiveStageCore(Core):
-    def __init__(self, ioDir, imem, dmem):
-        super(FiveStageCore, self).__init__(ioDir + "/FS_", imem, dmem)
-        self.opFilePath = ioDir + "/StateResult_FS.txt"
+    core_id = "FS"  # prefix of the result files
+
+    def __init__(self, ioDir, imem, dmem, trace=True, tracer=None, config=None):
+        super(FiveStageCore, self).__init__(ioDir + "/" + self.core_id + "_", imem, dmem, trace, tracer, config)
+        self.opFilePath = ioDir + "/StateResult_" + self.core_id + ".txt"
         self.stages = "Five Stage"
+        if self.tracer is None:
+            self.tracer = FileTraceSink(self.myRF.output_file, self.opFilePath) if trace else TraceSink()
+        self.flush_pending = False  # taken branch / jump in the previous cycle - next ID slot is squashed
+        self.flush_pc = 0  # PC of that branch / jump
+        self.memory_cycles = 0  # cycles the load / store in MEM has spent there
 
     def print_current_instruction(self, cycle, stage, instruction):
+        if not self.trace:
+            return
         if issubclass(type(instruction), Instruction):
-            print(f"{cycle}\t{stage}\t{instruction}")
+            self.tracer.console(f"{cycle}\t{stage}\t{instruction}")
         else:
             if all([x in ["0", "1"] for x in instruction]):
                 try:
-                    print(f"{cycle}\t{stage}\t{decode(int(instruction, 2))}")
+                    self.tracer.console(f"{cycle}\t{stage}\t{decode(int(instruction, 2))}")
                 except MachineDecodeError as e:
-                    print(f"{cycle}\t{stage}\tHalt")
+                    self.tracer.console(f"{cycle}\t{stage}\tHalt")
             else:
-                print(f"{cycle}\t{stage}\t{instruction}")
+                self.tracer.console(f"{cycle}\t{stage}\t{instruction}")
 
     def step(self):
         # Your implementation
+        stall_cycles = self.stall_cycles()
+        if stall_cycles:
+            return self.skip_stall(stall_cycles)
+
+        flushed, self.flush_pending = self.flush_pending, False
 
         # --------------------- WB stage ----------------------
         if not self.state.WB.nop:
@@ -132,11 +198,26 @@ class FiveStageCore(Core):
                 state=self.state,
                 nextState=self.nextState,
                 registers=self.myRF,
-                memory=self.ext_dmem)
+                memory=self.ext_dmem,
+                stats=self.stats,
+                config=self.config)
         else:
+            self.stats.bubble()
             self.print_current_instruction(self.cycle, "WB", "nop")
 
         # --------------------- MEM stage ---------------------
+        if self.memory_wait():
+            # the access takes more cycles - nothing reaches WB and the stages behind MEM hold their instructions
+            self.print_current_instruction(self.cycle, "MEM", self.state.MEM.instruction_ob.instruction)
+            for stage in ["EX", "ID", "IF"]:
+                self.print_current_instruction(self.cycle, stage, "stall")
+            self.nextState.WB.nop = True
+            self.flush_pending = flushed
+            self.stats.classify_cycle("memory_stall")
+            if self.profile is not None:
+                self.profile.record_cycle("memory_stall", self.state.MEM.instruction_ob.pc)
+            return self.end_cycle()
+
         if not self.state.MEM.nop:
             self.print_current_instruction(self.cycle, "MEM", self.state.MEM.instruction_ob.instruction)
 
@@ -144,17 +225,24 @@ class FiveStageCore(Core):
                 state=self.state,
                 nextState=self.nextState,
                 registers=self.myRF,
-                memory=self.ext_dmem)
+                memory=self.ext_dmem,
+                stats=self.stats,
+                config=self.config)
         else:
             self.nextState.WB.nop = True
             self.print_current_instruction(self.cycle, "MEM", "nop")
 
         # --------------------- EX stage ----------------------
+        squashed = False  # branch resolved in EX squashed the instruction in ID
         if not self.state.EX.nop:
             self.print_current_instruction(self.cycle, "EX", self.state.EX.instruction_ob.instruction)
 
-            self.state, self.nextState, self.ext_dmem, self.myRF, _ = self.state.EX.instruction_ob.execute(
-                state=self.state, nextState=self.nextState, registers=self.myRF, memory=self.ext_dmem)
+            self.state, self.nextState, self.ext_dmem, self.myRF, squashed = self.state.EX.instruction_ob.execute(
+                state=self.state, nextState=self.nextState, registers=self.myRF, memory=self.ext_dmem, stats=self.stats,
+                config=self.config)
+            if squashed:
+                self.flush_pending = True
+                self.flush_pc = self.state.EX.instruction_ob.pc
         else:
             self.nextState.MEM.nop = True
             self.print_current_instruction(self.cycle, "EX", "nop")
@@ -164,27 +252,47 @@ class FiveStageCore(Core):
             self.print_current_instruction(self.cycle, "ID", self.state.ID.instruction_bytes)
             try:
                 instruction = decode(int(self.state.ID.instruction_bytes, 2))
-                instruction_ob: InstructionBase = get_instruction_class(instruction.mnemonic)(instruction,
-                                                                                              self.ext_dmem,
-                                                                                              self.myRF,
-                                                                                              self.state,
-                                                                                              self.nextState)
+                cls = get_instruction_class(instruction.mnemonic, self.config.legacy_lw)
+                instruction_ob: InstructionBase = cls(instruction, self.ext_dmem, self.myRF, self.state,
+                                                      self.nextState)
+                instruction_ob.pc = self.state.IF.PC - 4
                 self.state, self.nextState, self.ext_dmem, self.myRF, _ = instruction_ob.decode(state=self.state,
                                                                                                 nextState=self.nextState,
                                                                                                 registers=self.myRF,
-                                                                                                memory=self.ext_dmem)
+                                                                                                memory=self.ext_dmem,
+                                                                                                stats=self.stats,
+                                                                                                config=self.config)
+                if instruction_ob.stalled:
+                    cycle_class = instruction_ob.stall_class
+                else:
+                    cycle_class = "base"
+                    self.stats.record_instruction(instruction_ob.pc, instruction_ob.category)
+                cycle_pc = instruction_ob.pc
+                self.flush_pending = instruction_ob.flushed
+                if self.flush_pending:
+                    self.flush_pc = instruction_ob.pc
             except MachineDecodeError as e:
                 if "{:08x}".format(e.word) == 'ffffffff':
                     self.nextState.ID.halt = True
+                    cycle_class = "drain"
+                    cycle_pc = None
                 else:
                     raise Exception("Invalid Instruction to Decode")
         else:
+            # empty ID slot - squashed by a taken branch, before the first fetch or after HALT
+            cycle_pc = self.flush_pc
+            if flushed or squashed:
+                cycle_class = "control_flush"
+            elif self.state.IF.nop:
+                cycle_class = "drain"
+            else:
+                cycle_class = "fill"
             self.nextState.EX.nop = True
             self.print_current_instruction(self.cycle, "ID", "nop")
 
         # --------------------- IF stage ----------------------
         if not self.state.IF.nop:
-            self.nextState.ID.instruction_bytes = self.ext_imem.read_instr(self.state.IF.PC)
+            self.nextState.ID.instruction_bytes = self.fetch(self.state.IF.PC, self.nextState.IF.instruction_count)
             self.nextState.ID.nop = False
             if self.nextState.ID.instruction_bytes == "1" * 32:
                 self.nextState.ID.nop = True
@@ -203,24 +311,83 @@ class FiveStageCore(Core):
                 self.state.WB.halt or self.state.WB.nop):
             self.nextState.IF.instruction_count = self.state.IF.instruction_count + 1
             self.halted = True
+            cycle_class = "base"  # HALT is counted as an instruction - this is its issue slot
+            cycle_pc = self.state.IF.PC
             self.print_current_instruction(self.cycle, "--", "End of Simulation")
-
-        self.myRF.output_rf(self.cycle)  # dump RF
-        self.printState(self.nextState, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
-
-        self.state = copy.deepcopy(self.nextState)
+        self.stats.classify_cycle(cycle_class)
+        if self.profile is not None:
+            self.profile.record_cycle(cycle_class, cycle_pc)
+
+        self.end_cycle()
+
+    def fetch(self, pc: int, instruction_count: int) -> str:
+        # with branches resolved in EX, the fetch behind a taken branch at the end of the program runs past the
+        # image - it reads HALT, which the branch squashes
+        if self.config.branch_resolution == "EX" and pc + 4 > len(self.ext_imem.IMem):
+            return "1" * 32
+        return super(FiveStageCore, self).fetch(pc, instruction_count)
+
+    def memory_access(self) -> bool:
+        # a load / store is in MEM
+        return not self.state.MEM.nop and (self.state.MEM.read_data_mem or self.state.MEM.write_data_mem)
+
+    def memory_wait(self) -> bool:
+        # True while the load / store in MEM has cycles of config.memory_latency left
+        if not self.memory_access():
+            return False
+        self.memory_cycles += 1
+        if self.memory_cycles < self.config.memory_latency:
+            return True
+        self.memory_cycles = 0
+        return False
+
+    def stall_cycles(self) -> int:
+        # cycles from now on in which only the load / store in MEM waits: WB holds a bubble and nothing behind MEM
+        # moves, so no latch, register or memory changes until the access completes. 0 - this cycle does work.
+        if not self.state.WB.nop or not self.memory_access():
+            return 0
+        return max(self.config.memory_latency - 1 - self.memory_cycles, 0)
+
+    def skip_stall(self, cycles: int):
+        # advance through `cycles` identical memory stall cycles at once - state equals nextState already, so there
+        # is nothing to copy. The per-cycle trace records are the ones step emits and are only produced with tracing
+        # on, without it the stall costs the same whatever its length.
+        self.memory_cycles += cycles
+        self.stats.bubble(cycles)
+        self.stats.classify_cycle("memory_stall", cycles)
+        if self.profile is not None:
+            self.profile.record_cycle("memory_stall", self.state.MEM.instruction_ob.pc, cycles)
+        if self.trace:
+            for cycle in range(self.cycle, self.cycle + cycles):
+                self.print_current_instruction(cycle, "WB", "nop")
+                self.print_current_instruction(cycle, "MEM", self.state.MEM.instruction_ob.instruction)
+                for stage in ["EX", "ID", "IF"]:
+                    self.print_current_instruction(cycle, stage, "stall")
+                self.tracer.rf(cycle, self.myRF)
+                self.tracer.memory(cycle, self.ext_dmem)
+                self.printState(self.nextState, cycle)
+        self.cycle += cycles
+
+    def end_cycle(self):
+        if self.trace:
+            self.tracer.rf(self.cycle, self.myRF)  # dump RF
+            self.tracer.memory(self.cycle, self.ext_dmem)
+            self.printState(self.nextState, self.cycle)  # print states after executing cycle 0, cycle 1, cycle 2 ...
+            if self.halted:
+                self.tracer.close()
+
+        self.state = self.nextState.copy()
         self.cycle += 1
 
+    def output_cpi_stack(self):
+        self.stats.output_cpi_stack(self.ioDir + "CPIStackResult.txt", self.stages, self.cycle,
+                                    self.state.IF.instruction_count)
+
     def printState(self, state, cycle):
         print_state = "\n" + "-" * 70 + "\n" + "State after executing cycle: " + str(cycle) + "\n\n"
         print_state += str(state)
 
-        if (cycle == 0):
-            perm = "w"
-        else:
-            perm = "a"
-        with open(self.opFilePath, perm) as wf:
-            wf.write(print_state)
+        self.tracer.state(cycle, print_state)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+import os
+
+from models import InsMem, DataMem
+from pipeline_config import PipelineConfig
+from rv32i_simulator import SingleStageCore, FiveStageCore, format_performance_metrics
+from superscalar import SuperscalarCore
+from tracing import MemoryTraceSink
+
+CORE_TYPES = {"SS": SingleStageCore, "FS": FiveStageCore, "SC": SuperscalarCore}
+
+
+class CoreResult(object):
+
+    def __init__(self, name: str, stages: str, registers: list, memory: bytes, metrics: dict, stats: dict,
+                 trace: MemoryTraceSink = None):
+        self.id = name  # SS / FS / SC
+        self.stages = stages  # Single Stage / Five Stage / Dual Issue Five Stage
+        self.registers = registers  # final RF as signed ints
+        self.memory = memory  # final DMem
+        self.metrics = metrics  # cycles, instructions, cpi, ipc
+        self.stats = stats  # ExecutionStats.to_dict()
+        self.trace = trace  # MemoryTraceSink - only when the simulation ran with trace=True
+
+    @classmethod
+    def from_core(cls, name: str, core):
+        metrics = core.performance_metrics()
+        stats = core.stats.to_dict()
+        if isinstance(core, FiveStageCore):
+            stats["cpi_stack"] = core.stats.cpi_stack(metrics["instructions"])
+        if isinstance(core, SuperscalarCore):
+            stats.update(core.issue_stats())
+        return cls(name, core.stages, list(core.myRF.registers), core.ext_dmem.to_bytes(), metrics, stats,
+                   core.tracer if isinstance(core.tracer, MemoryTraceSink) else None)
+
+    def to_dict(self) -> dict:
+        result = {
+            "core": self.id,
+            "stages": self.stages,
+            "registers": self.registers,
+            "memory": self.memory.hex(),
+            "metrics": self.metrics,
+            "stats": self.stats
+        }
+        if self.trace is not None:
+            result["trace"] = self.trace.to_dict()
+        return result
+
+    @classmethod
+    def from_dict(cls, result: dict):
+        trace = None
+        if "trace" in result:
+            trace = MemoryTraceSink()
+            trace.console_lines = result["trace"]["console"]
+            trace.rf_trace = result["trace"]["rf"]
+            trace.state_trace = result["trace"]["state"]
+            trace.memory_trace = [{int(page): bytes.fromhex(data) for page, data in delta.items()}
+                                  for delta in result["trace"].get("memory", [])]
+        return cls(result["core"], result["stages"], result["registers"], bytes.fromhex(result["memory"]), result["metrics"],
+                   result["stats"], trace)
+
+
+class SimulationResult(object):
+
+    def __init__(self, cores: dict):
+        self.cores = cores  # core id -> CoreResult, in simulation order
+
+    def __getitem__(self, name: str) -> CoreResult:
+        return self.cores[name]
+
+    def to_dict(self) -> dict:
+        return {name: result.to_dict() for name, result in self.cores.items()}
+
+    @classmethod
+    def from_dict(cls, result: dict):
+        return cls({name: CoreResult.from_dict(core) for name, core in result.items()})
+
+    def output(self, io_dir: str):
+        # same result files as main.py - file output is just one consumer of the result
+        metrics = []
+        for name, result in self.cores.items():
+            with open(os.path.join(io_dir, name + "_DMEMResult.txt"), "w") as rp:
+                rp.writelines(['{:08b}'.format(byte) + "\n" for byte in result.memory])
+            metrics.append(format_performance_metrics(result.stages, result.metrics))
+            if result.trace is not None:
+                with open(os.path.join(io_dir, name + "_RFResult.txt"), "w") as rp:
+                    for cycle, registers in enumerate(result.trace.rf_trace):
+                        rp.write("State of RF after executing cycle:\t" + str(cycle) + "\n")
+                        rp.writelines(['{:032b}'.format(val & 0xffffffff) + "\n" for val in registers])
+                with open(os.path.join(io_dir, "StateResult_" + name + ".txt"), "w") as rp:
+                    rp.writelines(result.trace.state_trace)
+        with open(os.path.join(io_dir, "PerformanceMetrics_Result.txt"), "w") as rp:
+            rp.writelines(metrics)
+
+
+class Simulator(object):
+    # runs a program from memory - no imem.txt / dmem.txt and no result files
+
+    def __init__(self, program, data=None, cores=("SS", "FS"), trace: bool = False, tracers: dict = None,
+                 cache=None, config: PipelineConfig = None):
+        # program / data - bytes, 32-bit ints or byte lines, see models.load_image
+        # tracers - core id -> TraceSink replacing the in-memory trace of that core
+        # cache - result_cache.ResultCache, not used together with tracers
+        # config - PipelineConfig of the cores, the default pipeline when not given
+        self.program = program
+        self.data = data
+        self.cores = cores
+        self.trace = trace
+        self.tracers = tracers or {}
+        self.cache = cache
+        self.config = config or PipelineConfig()
+
+    def build_cores(self) -> dict:
+        imem = InsMem("Imem", "", image=self.program)
+        cores = {}
+        for name in self.cores:
+            dmem = DataMem(name, "", image=self.data)
+            tracer = self.tracers.get(name, MemoryTraceSink() if self.trace else None)
+            cores[name] = CORE_TYPES[name]("", imem, dmem, trace=self.trace, tracer=tracer, config=self.config)
+        return cores
+
+    def run(self) -> SimulationResult:
+        key = None
+        if self.cache is not None and not self.tracers:
+            key = self.cache.key(self.program, self.data, cores=list(self.cores), trace=self.trace,
+                                 config=self.config.to_dict())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return SimulationResult.from_dict(cached)
+
+        cores = self.build_cores()
+
+        while not all([core.halted for core in cores.values()]):
+            for core in cores.values():
+                if not core.halted:
+                    core.step()
+
+        result = SimulationResult({name: CoreResult.from_core(name, core) for name, core in cores.items()})
+        if key is not None:
+            self.cache.put(key, result.to_dict())
+        return result
+
+
+def simulate(program, data=None, cores=("SS", "FS"), trace: bool = False) -> SimulationResult:
+    return Simulator(program, data, cores, trace).run()
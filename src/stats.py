@@ -0,0 +1,72 @@
+import json
+from array import array
+
+# instruction classes tracked in the instruction mix - see InstructionBase.category
+INSTRUCTION_CLASSES = ["R", "I", "LOAD", "S", "B", "J", "U"]
+# pipeline stage whose result is forwarded to the operand read in ID
+FORWARDING_SOURCES = ["EX", "MEM"]
+# CPI stack components - every FS cycle is attributed to exactly one of them
+CYCLE_CLASSES = ["base", "load_use_stall", "raw_stall", "memory_stall", "control_flush", "fill", "drain"]
+# cycles an instruction waits - on a load, on a producer without forwarding, on a multi-cycle memory access
+STALL_CLASSES = ["load_use_stall", "raw_stall", "memory_stall"]
+
+
+class ExecutionStats(object):
+
+    def __init__(self, pc_slots: int):
+        # counters are preallocated so that recording an event never allocates
+        self.instruction_mix = array("Q", [0] * len(INSTRUCTION_CLASSES))
+        self.pc_counts = array("Q", [0] * pc_slots)  # executed instructions per PC (PC // 4)
+        self.forwarding = array("Q", [0] * len(FORWARDING_SOURCES))
+        self.load_use_stalls: int = 0  # cycles an instruction was held in ID waiting on a load
+        self.branch_flushes: int = 0  # taken branches / jumps which squashed the fetched instruction
+        self.bubble_cycles: int = 0  # cycles where no instruction reached WB
+        self.cycle_classes = array("Q", [0] * len(CYCLE_CLASSES))
+
+    def record_instruction(self, pc: int, category: str):
+        self.pc_counts[pc >> 2] += 1
+        self.instruction_mix[INSTRUCTION_CLASSES.index(category)] += 1
+
+    def load_use_stall(self):
+        self.load_use_stalls += 1
+
+    def branch_flush(self):
+        self.branch_flushes += 1
+
+    def forwarded(self, source: str):
+        self.forwarding[FORWARDING_SOURCES.index(source)] += 1
+
+    def bubble(self, cycles: int = 1):
+        self.bubble_cycles += cycles
+
+    def classify_cycle(self, cycle_class: str, cycles: int = 1):
+        self.cycle_classes[CYCLE_CLASSES.index(cycle_class)] += cycles
+
+    def cpi_stack(self, instruction_count: int) -> dict:
+        # components sum to cycles / instruction_count, i.e. the measured CPI
+        return {key: float(cycles) / instruction_count for key, cycles in zip(CYCLE_CLASSES, self.cycle_classes)}
+
+    def output_cpi_stack(self, res_path: str, name: str, cycle: int, instruction_count: int):
+        if sum(self.cycle_classes) != cycle:
+            raise Exception("CPI stack - unclassified cycles")
+        op = [f"{name} Core CPI Stack-----------------------------\n"]
+        for (key, cpi), cycles in zip(self.cpi_stack(instruction_count).items(), self.cycle_classes):
+            op.append(f"{key}: {cpi} ({cycles} cycles)\n")
+        op.append(f"Cycles per instruction: {float(cycle) / instruction_count}\n")
+        with open(res_path, "w") as rp:
+            rp.writelines(op)
+
+    def to_dict(self) -> dict:
+        return {
+            "instruction_mix": dict(zip(INSTRUCTION_CLASSES, self.instruction_mix)),
+            "pc_counts": {str(slot << 2): count for slot, count in enumerate(self.pc_counts) if count},
+            "load_use_stalls": self.load_use_stalls,
+            "branch_flushes": self.branch_flushes,
+            "forwarding": dict(zip(FORWARDING_SOURCES, self.forwarding)),
+            "bubble_cycles": self.bubble_cycles,
+            "cycle_classes": dict(zip(CYCLE_CLASSES, self.cycle_classes))
+        }
+
+    def output_stats(self, res_path: str, **metrics):
+        with open(res_path, "w") as rp:
+            json.dump(dict(metrics, **self.to_dict()), rp, indent=2)
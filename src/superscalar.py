@@ -0,0 +1,300 @@
+from riscvmodel.code import decode, MachineDecodeError
+
+from instructions import get_instruction_class, InstructionBase
+from models import State
+from rv32i_simulator import FiveStageCore
+
+ISSUE_NAMES = {1: "Single", 2: "Dual"}
+# instruction classes using the single DMem port - one of them is issued per cycle at most
+MEMORY_CATEGORIES = ["LOAD", "S"]
+# why the younger instruction of a pair was held back - pairing rules, then hazards on instructions in flight
+SPLIT_ISSUE_REASONS = ["memory_port", "dependency", "control", "load_use_stall", "raw_stall"]
+
+
+class BypassRegisterView(object):
+    # the RF as read in ID - the youngest producer still in flight in any lane wins: the EX lanes (their results are
+    # in the next MEM latches by now), then the MEM lanes (next WB latches), else the RF, which WB has already
+    # written this cycle. Lanes are in program order, lane 0 is the oldest of its group.
+
+    def __init__(self, core):
+        self.core = core
+
+    def producer(self, register: int):
+        # (stage, lane) of the youngest instruction in flight writing the register, None if there is none
+        if register == 0:
+            return None
+        lanes = range(len(self.core.lanes) - 1, -1, -1)
+        for lane in lanes:
+            ex_state = self.core.lanes[lane].EX
+            if not ex_state.nop and ex_state.write_back_enable and ex_state.destination_register == register:
+                return "EX", lane
+        for lane in lanes:
+            mem_state = self.core.lanes[lane].MEM
+            if not mem_state.nop and mem_state.write_back_enable and mem_state.write_register_addr == register:
+                return "MEM", lane
+        return None
+
+    def read_rf(self, reg_addr: int) -> int:
+        producer = self.producer(reg_addr)
+        if producer is None or not self.core.config.forwarding:
+            return self.core.myRF.read_rf(reg_addr)
+        stage, lane = producer
+        self.core.stats.forwarded(stage)
+        next_lane = self.core.next_lanes[lane]
+        return next_lane.MEM.store_data if stage == "EX" else next_lane.WB.store_data
+
+
+class SuperscalarCore(FiveStageCore):
+    # in-order five stage pipeline issuing up to config.issue_width instructions per cycle. Every lane has its own
+    # State whose ID - WB latches are those of FiveStageCore - the instruction classes run on them unchanged. The
+    # front end (PC, instruction count) is self.state.IF, the IF latches of the lanes are scratch.
+    # Hazards are checked here for the whole group before an instruction decodes - it decodes against a bubble-only
+    # pipeline and reads its operands through the BypassRegisterView.
+    core_id = "SC"
+
+    def __init__(self, ioDir, imem, dmem, trace=True, tracer=None, config=None):
+        super(SuperscalarCore, self).__init__(ioDir, imem, dmem, trace, tracer, config)
+        self.width = self.config.issue_width
+        self.stages = ISSUE_NAMES[self.width] + " Issue Five Stage"
+        self.lanes = [self.lane_state() for _ in range(self.width)]
+        self.next_lanes = [self.lane_state() for _ in range(self.width)]
+        self.bypass = BypassRegisterView(self)
+        self.issue_state = State()  # ID context of the instruction being issued - EX and MEM always hold bubbles
+        self.issue_state.nop_init()
+        self.issue_counts = [0] * (self.width + 1)  # cycles by the number of instructions issued
+        self.split_issues = dict.fromkeys(SPLIT_ISSUE_REASONS, 0)  # groups cut short, by reason
+
+    @staticmethod
+    def lane_state() -> State:
+        state = State()
+        state.nop_init()
+        state.IF.nop = True
+        state.ID.PC = 0  # address of the instruction in ID
+        return state
+
+    def lanes_idle(self) -> bool:
+        return all([state.ID.nop and state.EX.nop and state.MEM.nop and state.WB.nop for state in self.lanes])
+
+    def memory_access(self) -> bool:
+        return any([not state.MEM.nop and (state.MEM.read_data_mem or state.MEM.write_data_mem)
+                    for state in self.lanes])
+
+    def stage_call(self, lane: int, stage: str, instruction_ob: InstructionBase):
+        # run the WB / MEM / EX stage of an instruction on its lane - returns the response of the stage
+        self.print_current_instruction(self.cycle, stage + str(lane), instruction_ob.instruction)
+        stage_function = {"WB": instruction_ob.wb, "MEM": instruction_ob.mem, "EX": instruction_ob.execute}[stage]
+        return stage_function(state=self.lanes[lane], nextState=self.next_lanes[lane], registers=self.myRF,
+                              memory=self.ext_dmem, stats=self.stats, config=self.config)[4]
+
+    def issue_hazard(self, instruction_ob: InstructionBase, group: list):
+        # reason the instruction cannot issue behind the instructions already issued this cycle, None if it can
+        sources = [register for register in [getattr(instruction_ob, "rs1", 0), getattr(instruction_ob, "rs2", 0)]
+                   if register != 0]
+        producers = [self.bypass.producer(register) for register in sources]
+        producers = [producer for producer in producers if producer is not None]
+        if group:
+            if instruction_ob.category in MEMORY_CATEGORIES and \
+                    any([older.category in MEMORY_CATEGORIES for older in group]):
+                return "memory_port"
+            if any([getattr(older, "rd", 0) in sources for older in group]):
+                return "dependency"
+            if self.config.branch_resolution == "EX" and any([older.category == "B" for older in group]):
+                # a branch resolved in EX squashes what is behind it - it ends its group
+                return "control"
+        if any([stage == "EX" and self.lanes[lane].EX.read_data_mem for stage, lane in producers]):
+            return "load_use_stall"
+        if producers and not self.config.forwarding:
+            return "raw_stall"
+        return None
+
+    def issue(self, lane: int, instruction_ob: InstructionBase):
+        # decode into EX of the same lane - lanes issue in order, so the lane is the slot in the group
+        issue_state = self.issue_state
+        issue_state.ID = self.lanes[lane].ID
+        issue_state.IF.PC = instruction_ob.pc + 4
+        issue_state.IF.nop = False
+        instruction_ob.decode(state=issue_state, nextState=self.next_lanes[lane], registers=self.bypass,
+                              memory=self.ext_dmem, stats=self.stats, config=self.config)
+        self.stats.record_instruction(instruction_ob.pc, instruction_ob.category)
+        self.nextState.IF.instruction_count = self.nextState.IF.instruction_count + 1
+
+    def fetch_group(self, pc: int):
+        # up to width instructions from pc into the ID latches - a HALT ends the group and stops fetching
+        next_front = self.nextState.IF
+        next_front.nop = False
+        for lane, next_lane in enumerate(self.next_lanes):
+            next_lane.ID.nop = True
+            if lane and pc + 4 > len(self.ext_imem.IMem):
+                # the group runs past the image behind a jump or branch - the first lane of the next fetch decides
+                self.print_current_instruction(self.cycle, "IF" + str(lane), "nop")
+                continue
+            if next_front.nop:
+                self.print_current_instruction(self.cycle, "IF" + str(lane), "nop")
+                continue
+            instruction_bytes = self.fetch(pc, next_front.instruction_count + lane)
+            self.print_current_instruction(self.cycle, "IF" + str(lane), instruction_bytes)
+            if instruction_bytes == "1" * 32:
+                next_front.nop = True
+                continue
+            next_lane.ID.set_attributes(nop=False, instruction_bytes=instruction_bytes, PC=pc)
+            pc += 4
+        next_front.PC = pc
+
+    def step(self):
+        flushed, self.flush_pending = self.flush_pending, False
+
+        if self.state.IF.nop and self.lanes_idle():
+            # nothing left in flight - the issue slot of HALT, see FiveStageCore.step
+            self.stats.bubble()
+            self.nextState.IF.instruction_count = self.state.IF.instruction_count + 1
+            self.halted = True
+            self.issue_counts[0] += 1
+            self.stats.classify_cycle("base")
+            if self.profile is not None:
+                self.profile.record_cycle("base", self.state.IF.PC)
+            self.print_current_instruction(self.cycle, "--", "End of Simulation")
+            return self.end_cycle()
+
+        # --------------------- WB stage ----------------------
+        for lane, state in enumerate(self.lanes):
+            if not state.WB.nop:
+                self.stage_call(lane, "WB", state.WB.instruction_ob)
+            else:
+                self.print_current_instruction(self.cycle, "WB" + str(lane), "nop")
+        if all([state.WB.nop for state in self.lanes]):
+            self.stats.bubble()
+
+        # --------------------- MEM stage ---------------------
+        if self.memory_wait():
+            # the group waits for its load / store - nothing reaches WB and the stages behind MEM hold
+            for lane, next_lane in enumerate(self.next_lanes):
+                next_lane.WB.nop = True
+                self.print_current_instruction(self.cycle, "MEM" + str(lane), "stall")
+            self.flush_pending = flushed
+            self.issue_counts[0] += 1
+            self.stats.classify_cycle("memory_stall")
+            if self.profile is not None:
+                self.profile.record_cycle("memory_stall", [state.MEM.instruction_ob.pc for state in self.lanes if
+                                                           not state.MEM.nop and state.MEM.instruction_ob.category
+                                                           in MEMORY_CATEGORIES][0])
+            return self.end_cycle()
+
+        for lane, state in enumerate(self.lanes):
+            if not state.MEM.nop:
+                self.stage_call(lane, "MEM", state.MEM.instruction_ob)
+            else:
+                self.next_lanes[lane].WB.nop = True
+                self.print_current_instruction(self.cycle, "MEM" + str(lane), "nop")
+
+        # --------------------- EX stage ----------------------
+        redirect = None  # PC fetched next after a taken branch / jump of this cycle
+        squashed = False  # branch resolved in EX squashed the instructions in ID
+        for lane, state in enumerate(self.lanes):
+            if not state.EX.nop:
+                if self.stage_call(lane, "EX", state.EX.instruction_ob):
+                    squashed = True
+                    self.flush_pending = True
+                    self.flush_pc = state.EX.instruction_ob.pc
+                    redirect = self.next_lanes[lane].IF.PC
+            else:
+                self.next_lanes[lane].MEM.nop = True
+                self.print_current_instruction(self.cycle, "EX" + str(lane), "nop")
+
+        # --------------------- ID stage ----------------------
+        group = []  # instructions issued this cycle, oldest first
+        hazard = None  # why the oldest instruction in ID did not issue
+        held = False  # Flag - an instruction of this cycle stays in ID, so do all younger ones
+        for lane, state in enumerate(self.lanes):
+            if state.ID.nop or squashed or redirect is not None or held:
+                self.print_current_instruction(self.cycle, "ID" + str(lane),
+                                               "stall" if held and not state.ID.nop else "nop")
+                continue
+            try:
+                instruction = decode(int(state.ID.instruction_bytes, 2))
+            except MachineDecodeError as e:
+                raise Exception("Invalid Instruction to Decode")
+            cls = get_instruction_class(instruction.mnemonic, self.config.legacy_lw)
+            instruction_ob: InstructionBase = cls(instruction, self.ext_dmem, self.myRF, self.issue_state,
+                                                  self.next_lanes[lane])
+            instruction_ob.pc = state.ID.PC
+            reason = self.issue_hazard(instruction_ob, group)
+            if reason is not None:
+                self.print_current_instruction(self.cycle, "ID" + str(lane), "stall")
+                if group:
+                    self.split_issues[reason] += 1
+                else:
+                    hazard = reason
+                held = True
+                continue
+            self.print_current_instruction(self.cycle, "ID" + str(lane), instruction)
+            self.issue(lane, instruction_ob)
+            group.append(instruction_ob)
+            if instruction_ob.flushed:
+                # taken branch / jump in ID - the younger lanes are squashed
+                self.flush_pending = True
+                self.flush_pc = instruction_ob.pc
+                redirect = self.next_lanes[lane].IF.PC
+        for lane in range(len(group), self.width):
+            self.next_lanes[lane].EX.nop = True
+        self.issue_counts[len(group)] += 1
+
+        if group:
+            cycle_class, cycle_pc = "base", group[0].pc
+        elif hazard is not None:
+            cycle_class, cycle_pc = hazard, self.lanes[0].ID.PC
+            if hazard == "load_use_stall":
+                self.stats.load_use_stall()
+        else:
+            # empty ID - squashed by a taken branch, before the first fetch or after HALT
+            cycle_pc = self.flush_pc
+            if flushed or squashed:
+                cycle_class = "control_flush"
+            elif self.state.IF.nop:
+                cycle_class = "drain"
+            else:
+                cycle_class = "fill"
+
+        # --------------------- IF stage ----------------------
+        if redirect is not None:
+            self.nextState.IF.PC = redirect
+            self.nextState.IF.nop = False
+            for lane, next_lane in enumerate(self.next_lanes):
+                next_lane.ID.nop = True
+                self.print_current_instruction(self.cycle, "IF" + str(lane), "nop")
+        elif len(group) < self.width and not self.lanes[len(group)].ID.nop:
+            # instructions left in ID are fetched again, at the head of the next group
+            self.fetch_group(self.lanes[len(group)].ID.PC)
+        elif not self.state.IF.nop:
+            self.fetch_group(self.state.IF.PC)
+        else:
+            for lane, next_lane in enumerate(self.next_lanes):
+                next_lane.ID.nop = True
+                self.print_current_instruction(self.cycle, "IF" + str(lane), "nop")
+
+        self.stats.classify_cycle(cycle_class)
+        if self.profile is not None:
+            self.profile.record_cycle(cycle_class, cycle_pc)
+
+        self.end_cycle()
+
+    def end_cycle(self):
+        super(SuperscalarCore, self).end_cycle()
+        self.lanes = [state.copy() for state in self.next_lanes]
+
+    def issue_stats(self) -> dict:
+        return {
+            "issue_width": self.width,
+            "issue_counts": {str(count): cycles for count, cycles in enumerate(self.issue_counts)},
+            "split_issues": self.split_issues
+        }
+
+    def output_stats(self, **extra):
+        super(SuperscalarCore, self).output_stats(**self.issue_stats(), **extra)
+
+    def printState(self, state, cycle):
+        print_state = "\n" + "-" * 70 + "\n" + "State after executing cycle: " + str(cycle) + "\n\n" + str(state.IF)
+        for lane, lane_state in enumerate(self.next_lanes):
+            print_state += f"\n\nLane {lane}\n\n" + "\n\n".join([str(lane_state.ID), str(lane_state.EX),
+                                                                  str(lane_state.MEM), str(lane_state.WB)])
+
+        self.tracer.state(cycle, print_state)
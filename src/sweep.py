@@ -0,0 +1,137 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from models import read_image
+from pipeline_config import PipelineConfig
+from simulator import Simulator
+from stats import CYCLE_CLASSES
+
+CONFIG_FIELDS = ["forwarding", "branch_resolution", "memory_latency", "instruction_cap", "legacy_lw", "issue_width"]
+COLUMNS = CONFIG_FIELDS + ["workload", "cycles", "instructions", "cpi", "ipc"] + \
+          ["cpi_" + key for key in CYCLE_CLASSES] + ["error"]
+
+
+def parse_list(text: str, convert) -> list:
+    return [convert(value.strip()) for value in text.split(",") if value.strip()]
+
+
+def parse_switch(value: str) -> bool:
+    if value.lower() not in ["on", "off"]:
+        raise Exception(f"Invalid forwarding setting - {value}")
+    return value.lower() == "on"
+
+
+def load_workload(workload: str):
+    # benchmark workload name or a directory with imem.txt / dmem.txt
+    if os.path.isdir(workload):
+        return read_image(os.path.join(workload, "imem.txt")), read_image(os.path.join(workload, "dmem.txt"))
+    import benchmark
+    if workload not in benchmark.WORKLOADS:
+        raise Exception(f"Unknown workload - {workload}")
+    return benchmark.WORKLOADS[workload]()
+
+
+def grid(forwarding: list, branch_resolution: list, memory_latency: list, instruction_cap: list,
+         issue_width: list = (1,)) -> list:
+    return [PipelineConfig(*point[:4], issue_width=point[4]) for point in
+            itertools.product(forwarding, branch_resolution, memory_latency, instruction_cap, issue_width)]
+
+
+def workload_lw(workload: str) -> bool:
+    # legacy_lw of a workload - directories hold test programs, benchmark workloads know their encoding
+    if os.path.isdir(workload):
+        return True
+    import benchmark
+    return benchmark.workload_config(workload).legacy_lw
+
+
+def run_point(job: tuple) -> tuple:
+    # (index, config dict, workload) -> row of the CPI table, without traces - the scalar points run on FS, the
+    # wider ones on the superscalar core
+    # a point that fails gets a row with its error - the rest of the sweep still completes
+    index, config, workload = job
+    try:
+        program, data = load_workload(workload)
+        config = dict(config, legacy_lw=workload_lw(workload))
+        core = "FS" if config["issue_width"] == 1 else "SC"
+        result = Simulator(program, data, cores=(core,), config=PipelineConfig.from_dict(config)).run()[core]
+    except Exception as e:
+        return index, dict(config, workload=workload, error=f"{type(e).__name__}: {e}")
+    row = dict(config, workload=workload, cycles=result.metrics["cycles"],
+               instructions=result.metrics["instructions"], cpi=result.metrics["cpi"], ipc=result.metrics["ipc"])
+    row.update({"cpi_" + key: cpi for key, cpi in result.stats["cpi_stack"].items()})
+    return index, row
+
+
+def run_sweep(configs: list, workloads: list, processes: int) -> list:
+    # every configuration x workload in a process pool - rows come back in grid order
+    jobs = [(index, config.to_dict(), workload)
+            for index, (config, workload) in enumerate(itertools.product(configs, workloads))]
+    rows = [None] * len(jobs)
+    with multiprocessing.Pool(processes) as pool:
+        for index, row in pool.imap_unordered(run_point, jobs):
+            rows[index] = row
+    return rows
+
+
+def write_csv(path: str, rows: list):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(path: str, rows: list):
+    with open(path, "w") as file:
+        json.dump(rows, file, indent=2)
+
+
+def format_table(rows: list) -> list:
+    op = [f"{'configuration':<40} {'workload':<12} {'cycles':>8} {'instrs':>8} {'CPI':>7} {'IPC':>7}\n"]
+    for row in rows:
+        label = PipelineConfig.from_dict({key: row[key] for key in CONFIG_FIELDS}).label()
+        if "error" in row:
+            op.append(f"{label:<40} {row['workload']:<12} failed - {row['error']}\n")
+            continue
+        op.append(f"{label:<40} {row['workload']:<12} {row['cycles']:>8} {row['instructions']:>8} {row['cpi']:>7.3f} "
+                  f"{row['ipc']:>7.3f}\n")
+    return op
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RV32I pipeline design-space sweep')
+    parser.add_argument("--forwarding", default="on,off", type=str, help="Forwarding settings, on / off.")
+    parser.add_argument("--branch", default="ID,EX", type=str, help="Branch resolution stages, ID / EX.")
+    parser.add_argument("--memory-latency", default="1,2,4", type=str, help="Cycles of a load / store in MEM.")
+    parser.add_argument("--instruction-cap", default="0", type=str,
+                        help="Instructions fetched at most, 0 - run to HALT.")
+    parser.add_argument("--issue-width", default="1", type=str, help="Instructions issued per cycle, 1 / 2.")
+    parser.add_argument("--workloads", default="TC0,TC1,TC2,TC3,TC4,loop,random", type=str,
+                        help="Benchmark workload names or directories with imem.txt / dmem.txt.")
+    parser.add_argument("--processes", default=os.cpu_count(), type=int, help="Number of worker processes.")
+    parser.add_argument("--out", default="sweep", type=str, help="Results are written to <out>.csv and <out>.json.")
+    args = parser.parse_args()
+
+    configs = grid(parse_list(args.forwarding, parse_switch), parse_list(args.branch, str.upper),
+                   parse_list(args.memory_latency, int), parse_list(args.instruction_cap, int),
+                   parse_list(args.issue_width, int))
+    workloads = parse_list(args.workloads, str)
+
+    start = time.time()
+    rows = run_sweep(configs, workloads, args.processes)
+    sys.stdout.writelines(format_table(rows))
+    write_csv(args.out + ".csv", rows)
+    write_json(args.out + ".json", rows)
+    failed = len([row for row in rows if "error" in row])
+    print(f"{len(rows)} points in {time.time() - start:.1f} s{f', {failed} failed' if failed else ''} - "
+          f"{args.out}.csv, {args.out}.json")
+
+
+if __name__ == "__main__":
+    main()
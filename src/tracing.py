@@ -0,0 +1,151 @@
+import signal
+import sys
+from array import array
+
+from models import RegisterFile, rebuild_image
+
+
+class TraceSink(object):
+    # receives the per-cycle output of a core - the base sink drops everything
+
+    def console(self, line: str):
+        pass
+
+    def rf(self, cycle: int, registers: RegisterFile):
+        pass
+
+    def state(self, cycle: int, text: str):
+        pass
+
+    def memory(self, cycle: int, memory):
+        # DataMem after the cycle - sinks which record it keep memory.delta of their own epochs
+        pass
+
+    def close(self):
+        pass
+
+
+class FileTraceSink(TraceSink):
+    # classic output - pipeline trace on stdout, RFResult / StateResult files
+
+    def __init__(self, rf_path: str, state_path: str, echo: bool = True):
+        self.rf_path = rf_path
+        self.state_path = state_path
+        self.echo = echo
+        self.rf_file = None
+        self.state_file = None
+
+    def console(self, line: str):
+        if self.echo:
+            print(line)
+
+    def rf(self, cycle: int, registers: RegisterFile):
+        if self.rf_file is None:
+            self.rf_file = open(self.rf_path, "w")
+        self.rf_file.writelines(registers.dump_rf(cycle))
+
+    def state(self, cycle: int, text: str):
+        if self.state_file is None:
+            self.state_file = open(self.state_path, "w")
+        self.state_file.write(text)
+
+    def close(self):
+        for file in [self.rf_file, self.state_file]:
+            if file is not None:
+                file.close()
+        self.rf_file = self.state_file = None
+
+
+class MemoryTraceSink(TraceSink):
+    # keeps the trace as python objects - used by the in-process Simulator API
+
+    def __init__(self):
+        self.console_lines = []
+        self.rf_trace = []  # registers after every cycle
+        self.state_trace = []  # state dump text of every cycle
+        self.memory_trace = []  # pages written in every cycle (page -> bytes), the first record holds all of DMem
+        self.memory_epoch = 0
+
+    def console(self, line: str):
+        self.console_lines.append(line)
+
+    def rf(self, cycle: int, registers: RegisterFile):
+        self.rf_trace.append(list(registers.registers))
+
+    def state(self, cycle: int, text: str):
+        self.state_trace.append(text)
+
+    def memory(self, cycle: int, memory):
+        self.memory_trace.append(memory.delta(self.memory_epoch))
+        self.memory_epoch = memory.new_epoch()
+
+    def memory_at(self, cycle: int) -> bytes:
+        # DMem after the cycle
+        return rebuild_image(b"", self.memory_trace[:cycle + 1])
+
+    def to_dict(self) -> dict:
+        return {"console": self.console_lines, "rf": self.rf_trace, "state": self.state_trace,
+                "memory": [{str(page): data.hex() for page, data in delta.items()} for delta in self.memory_trace]}
+
+
+class FlightRecorderSink(TraceSink):
+    # keeps the last `capacity` cycles in a preallocated ring - written out only on halt, error or signal
+
+    def __init__(self, capacity: int, rf_path: str, state_path: str, echo: bool = True):
+        self.capacity = capacity
+        self.rf_path = rf_path
+        self.state_path = state_path
+        self.echo = echo
+        self.cycles = array("q", [-1] * capacity)  # cycle held by every slot, -1 - empty
+        self.registers = array("i", [0] * (capacity * 32))  # 32 registers per slot
+        self.states = [""] * capacity
+        self.consoles = [[] for _ in range(capacity)]
+        self.cycle = 0  # cycle currently being recorded
+
+    def console(self, line: str):
+        self.consoles[self.cycle % self.capacity].append(line)
+
+    def rf(self, cycle: int, registers: RegisterFile):
+        slot = cycle % self.capacity
+        self.cycles[slot] = cycle
+        self.registers[slot * 32: slot * 32 + 32] = registers.registers
+
+    def state(self, cycle: int, text: str):
+        self.states[cycle % self.capacity] = text
+        # the slot of the next cycle is reused - drop the console lines of the cycle it held
+        self.cycle = cycle + 1
+        self.consoles[self.cycle % self.capacity].clear()
+
+    def recorded_slots(self) -> list:
+        return sorted([slot for slot in range(self.capacity) if self.cycles[slot] >= 0],
+                      key=lambda slot: self.cycles[slot])
+
+    def dump(self, reason: str):
+        slots = self.recorded_slots()
+        with open(self.rf_path, "w") as rf_file, open(self.state_path, "w") as state_file:
+            for slot in slots:
+                rf_file.write("State of RF after executing cycle:\t" + str(self.cycles[slot]) + "\n")
+                rf_file.writelines(['{:032b}'.format(val & 0xffffffff) + "\n"
+                                    for val in self.registers[slot * 32: slot * 32 + 32]])
+                state_file.write(self.states[slot])
+        if self.echo:
+            for slot in slots:
+                for line in self.consoles[slot]:
+                    print(line)
+            print(f"Flight recorder ({reason}): last {len(slots)} cycles written to {self.rf_path}, {self.state_path}")
+
+    def close(self):
+        self.dump("halt")
+
+
+def dump_on_signal(recorders: list):
+    # SIGUSR1 - dump and keep simulating, SIGTERM - dump and stop
+    def dump(signum, frame):
+        for recorder in recorders:
+            recorder.dump("signal")
+        if signum == signal.SIGTERM:
+            sys.exit(128 + signum)
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, dump)
+    signal.signal(signal.SIGTERM, dump)
@@ -0,0 +1,98 @@
+import os
+
+from models import RegisterFile, DataMem
+from tracing import TraceSink
+
+
+class TraceMismatch(Exception):
+
+    def __init__(self, file: str, cycle: int, field: str, expected: str, actual: str):
+        self.file = file
+        self.cycle = cycle
+        self.field = field
+        self.expected = expected
+        self.actual = actual
+        super(TraceMismatch, self).__init__(
+            f"{os.path.basename(file)}: cycle {cycle}, {field} - expected {expected!r}, got {actual!r}")
+
+
+class ExpectedStream(object):
+    # ExpectedResults file read one line at a time - line endings / trailing blanks are not compared
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path)
+
+    def expect(self, line: str, cycle: int, field: str):
+        expected = self.file.readline()
+        if expected == "":
+            raise TraceMismatch(self.path, cycle, field, "<end of file>", line.rstrip())
+        if expected.rstrip() != line.rstrip():
+            raise TraceMismatch(self.path, cycle, field, expected.rstrip(), line.rstrip())
+
+    def finish(self, cycle: int):
+        # the expected trace must not continue past the simulated one
+        for expected in self.file:
+            if expected.strip():
+                self.file.close()
+                raise TraceMismatch(self.path, cycle, "end of trace", expected.rstrip(), "<end of simulation>")
+        self.file.close()
+
+
+class VerifyingTraceSink(TraceSink):
+    # compares every cycle's output against the expected files as it is produced, nothing is materialized
+
+    def __init__(self, rf_path: str = None, state_path: str = None, inner: TraceSink = None):
+        self.rf_stream = ExpectedStream(rf_path) if rf_path else None
+        self.state_stream = ExpectedStream(state_path) if state_path else None
+        self.inner = inner if inner is not None else TraceSink()  # receives the output after the comparison
+        self.cycle = 0
+        self.state_partial = ""  # state text after the last newline - FS dumps do not end with one
+        self.state_partial_cycle = 0
+
+    def console(self, line: str):
+        self.inner.console(line)
+
+    def rf(self, cycle: int, registers: RegisterFile):
+        self.cycle = cycle
+        if self.rf_stream is not None:
+            for i, line in enumerate(registers.dump_rf(cycle)):
+                self.rf_stream.expect(line, cycle, "cycle header" if i == 0 else f"x{i - 1}")
+        self.inner.rf(cycle, registers)
+
+    def state(self, cycle: int, text: str):
+        self.cycle = cycle
+        if self.state_stream is not None:
+            lines = (self.state_partial + text).split("\n")
+            for i, line in enumerate(lines[:-1]):
+                self.expect_state(line, self.state_partial_cycle if i == 0 else cycle)
+            self.state_partial, self.state_partial_cycle = lines[-1], cycle
+        self.inner.state(cycle, text)
+
+    def memory(self, cycle: int, memory):
+        self.inner.memory(cycle, memory)
+
+    def expect_state(self, line: str, cycle: int):
+        self.state_stream.expect(line, cycle, line.split(":")[0] if ":" in line else "separator")
+
+    def close(self):
+        if self.state_stream is not None and self.state_partial:
+            self.expect_state(self.state_partial, self.state_partial_cycle)
+        for stream in [self.rf_stream, self.state_stream]:
+            if stream is not None:
+                stream.finish(self.cycle)
+        self.inner.close()
+
+
+def verifying_tracer(expected_dir: str, name: str, state: bool = False, inner: TraceSink = None) -> TraceSink:
+    # RF trace of core SS / FS, plus the state trace when it was produced by this simulator
+    rf_path = os.path.join(expected_dir, name + "_RFResult.txt")
+    state_path = os.path.join(expected_dir, "StateResult_" + name + ".txt")
+    return VerifyingTraceSink(rf_path, state_path if state else None, inner)
+
+
+def verify_data_mem(expected_dir: str, dmem: DataMem, cycle: int):
+    stream = ExpectedStream(os.path.join(expected_dir, dmem.id + "_DMEMResult.txt"))
+    for address, data in enumerate(dmem.DMem):
+        stream.expect(data, cycle, f"DMem[{address}]")
+    stream.finish(cycle)
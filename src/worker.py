@@ -0,0 +1,121 @@
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socketserver
+import sys
+import threading
+
+from models import read_image
+from pipeline_config import PipelineConfig
+from result_cache import ResultCache
+from simulator import Simulator
+
+# Job - one JSON object per line:
+#   {"id": ..., "iodir": "dir with imem.txt / dmem.txt"}
+#   {"id": ..., "imem": "path/imem.txt", "dmem": "path/dmem.txt"}
+#   {"id": ..., "program": [32-bit words] | "hex bytes" | ["byte lines"], "data": same as program}
+# optional: "cores": ["SS", "FS"], "trace": "none" | "full", "config": PipelineConfig.to_dict() - missing keys default
+# Result - one JSON object per line, in completion order:
+#   {"id": ..., "ok": true, "result": SimulationResult.to_dict()} / {"id": ..., "ok": false, "error": "..."}
+
+cache = None  # ResultCache of the worker process - set up by init_worker
+
+
+def init_worker(cache_dir: str, cache_size: int):
+    global cache
+    cache = ResultCache(cache_dir, cache_size) if cache_dir else None
+
+
+def job_image(job: dict, inline_key: str, path_key: str, file_name: str):
+    if inline_key in job:
+        image = job[inline_key]
+        return bytes.fromhex(image) if isinstance(image, str) else image
+    if path_key in job:
+        return read_image(job[path_key])
+    if "iodir" in job:
+        return read_image(os.path.join(job["iodir"], file_name))
+    return None
+
+
+def run_job(line: str) -> str:
+    job_id = None
+    try:
+        job = json.loads(line)
+        job_id = job.get("id")
+        program = job_image(job, "program", "imem", "imem.txt")
+        if program is None:
+            raise Exception("Job without program - give iodir, imem or program")
+        data = job_image(job, "data", "dmem", "dmem.txt")
+        config = PipelineConfig.from_dict(job["config"]) if "config" in job else None
+        result = Simulator(program, data, cores=tuple(job.get("cores", ["SS", "FS"])),
+                           trace=job.get("trace", "none") == "full", cache=cache, config=config).run()
+        response = {"id": job_id, "ok": True, "result": result.to_dict()}
+    except Exception as e:
+        response = {"id": job_id, "ok": False, "error": str(e)}
+    return json.dumps(response)
+
+
+def serve_stream(pool: multiprocessing.Pool, lines, write):
+    # jobs are handed to the pool as they are read, results written as soon as they complete
+    for response in pool.imap_unordered(run_job, (line for line in lines if line.strip()), chunksize=1):
+        write(response)
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        lock = threading.Lock()
+
+        def write(response: str):
+            with lock:
+                self.wfile.write((response + "\n").encode())
+                self.wfile.flush()
+
+        serve_stream(self.server.pool, (line.decode() for line in self.rfile), write)
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, pool: multiprocessing.Pool):
+        self.pool = pool
+        super(JobServer, self).__init__(path, JobHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RV32I simulation worker')
+    parser.add_argument("--socket", default="", type=str, help="Unix socket path - read jobs from stdin if not given.")
+    parser.add_argument("--processes", default=os.cpu_count(), type=int, help="Number of worker processes.")
+    parser.add_argument("--cache", default="", type=str, help="Result cache directory shared by the workers.")
+    parser.add_argument("--cache-size", default=256, type=int, help="Result cache size limit in MB.")
+    args = parser.parse_args()
+
+    with multiprocessing.Pool(args.processes, initializer=init_worker,
+                              initargs=(args.cache, args.cache_size * 1024 * 1024)) as pool:
+        if not args.socket:
+            def write(response: str):
+                sys.stdout.write(response + "\n")
+                sys.stdout.flush()
+
+            serve_stream(pool, sys.stdin, write)
+            return
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        signal.signal(signal.SIGTERM, stop)
+        with JobServer(args.socket, pool) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+/* RV32I instructions beyond the classic subset - run with --lb, the loads here use the RV32I encodings
+(funct3 000 is LB, LW is funct3 010). Shifts, slt / sltu, lui / auipc, byte / half word loads and stores,
+the four ordered branches, jal / jalr, and a load feeding a shift and a branch. Ends with ecall.
+
+DMem: [0] 0x80FF7F01  [4] 5  [8] -16
+*/
+
+0:        lui x1, 74565          // 0x123450B7 - R1 = 0x12345000
+4:        addi x1, x1, 1656      // 0x67808093 - R1 = 0x12345678 - forwarded from EX
+8:        auipc x2, 1            // 0x00001117 - R2 = PC + 0x1000 = 4104
+12:       lb x3, 0(x0)           // 0x00000183 - R3 = sext(0x80) = -128
+16:       lbu x4, 0(x0)          // 0x00004203 - R4 = 0x80 = 128
+20:       lh x5, 2(x0)           // 0x00201283 - R5 = sext(0x7F01) = 32513
+24:       lhu x6, 0(x0)          // 0x00005303 - R6 = 0x80FF = 33023
+28:       lh x7, 0(x0)           // 0x00001383 - R7 = sext(0x80FF) = -32513
+32:       lw x8, 8(x0)           // 0x00802403 - R8 = -16
+36:       lw x11, 4(x0)          // 0x00402583 - R11 = 5
+40:       sll x12, x4, x11       // 0x00B21633 - R12 = 128 << 5 = 4096 - load-use stall on R11
+44:       srl x13, x8, x11       // 0x00B456B3 - R13 = 0xFFFFFFF0 >>> 5 = 134217727
+48:       sra x14, x8, x11       // 0x40B45733 - R14 = -16 >> 5 = -1
+52:       slli x15, x1, 0x04     // 0x00409793 - R15 = 0x23456780 = 591751040
+56:       srli x16, x3, 0x1c     // 0x01C1D813 - R16 = 0xFFFFFF80 >>> 28 = 15
+60:       srai x17, x7, 0x04     // 0x4043D893 - R17 = -32513 >> 4 = -2033
+64:       slt x18, x8, x11       // 0x00B42933 - R18 = -16 < 5 = 1
+68:       sltu x19, x8, x11      // 0x00B439B3 - R19 = 0xFFFFFFF0 <u 5 = 0
+72:       slti x20, x3, -127     // 0xF811AA13 - R20 = -128 < -127 = 1
+76:       sltiu x21, x4, -1      // 0xFFF23A93 - R21 = 128 <u 0xFFFFFFFF = 1
+80:       sb x1, 16(x0)          // 0x00100823 - Mem[16] = 0x78
+84:       sh x1, 18(x0)          // 0x00101923 - Mem[18] = 0x5678
+88:       lw x22, 16(x0)         // 0x01002B03 - R22 = 0x78005678 = 2013288056
+92:       lb x28, 3(x0)          // 0x00300E03 - R28 = 1
+96:       bne x28, x0, .+8       // 0x000E1463 - Taken - R28 comes from the load before
+100:      addi x23, x0, 9        // 0x00900B93 - Skipped
+104: B1:  blt x8, x11, .+8       // 0x00B44463 - Taken - -16 < 5
+108:      addi x23, x0, 1        // 0x00100B93 - Skipped
+112: B2:  bge x11, x8, .+8       // 0x0085D463 - Taken - 5 >= -16
+116:      addi x23, x23, 2       // 0x002B8B93 - Skipped
+120: B3:  bltu x8, x11, .+8      // 0x00B46463 - Not taken - 0xFFFFFFF0 >=u 5
+124:      addi x24, x0, 3        // 0x00300C13 - R24 = 3
+128: B4:  bgeu x8, x11, .+8      // 0x00B47463 - Taken - 0xFFFFFFF0 >=u 5
+132:      addi x24, x24, 4       // 0x004C0C13 - Skipped
+136: B5:  jal x25, .+12          // 0x00C00CEF - Call FN, R25 = return address
+140: RET: sh x12, 22(x0)         // 0x00C01B23 - Mem[22] = 0x1000
+144:      ecall                  // 0x00000073 - Ends the program
+148: FN:  addi x26, x0, 7        // 0x00700D13 - R26 = 7
+152:      jalr x27, x25, 0       // 0x000C8DE7 - Return to RET, R27 = PC + 4
+156:      addi x26, x0, 99       // 0x06300D13 - Never runs
+
+
+/* In Binary
+00010010001101000101000010110111 - 0x123450B7
+01100111100000001000000010010011 - 0x67808093
+00000000000000000001000100010111 - 0x00001117
+00000000000000000000000110000011 - 0x00000183
+00000000000000000100001000000011 - 0x00004203
+00000000001000000001001010000011 - 0x00201283
+00000000000000000101001100000011 - 0x00005303
+00000000000000000001001110000011 - 0x00001383
+00000000100000000010010000000011 - 0x00802403
+00000000010000000010010110000011 - 0x00402583
+00000000101100100001011000110011 - 0x00B21633
+00000000101101000101011010110011 - 0x00B456B3
+01000000101101000101011100110011 - 0x40B45733
+00000000010000001001011110010011 - 0x00409793
+00000001110000011101100000010011 - 0x01C1D813
+01000000010000111101100010010011 - 0x4043D893
+00000000101101000010100100110011 - 0x00B42933
+00000000101101000011100110110011 - 0x00B439B3
+11111000000100011010101000010011 - 0xF811AA13
+11111111111100100011101010010011 - 0xFFF23A93
+00000000000100000000100000100011 - 0x00100823
+00000000000100000001100100100011 - 0x00101923
+00000001000000000010101100000011 - 0x01002B03
+00000000001100000000111000000011 - 0x00300E03
+00000000000011100001010001100011 - 0x000E1463
+00000000100100000000101110010011 - 0x00900B93
+00000000101101000100010001100011 - 0x00B44463
+00000000000100000000101110010011 - 0x00100B93
+00000000100001011101010001100011 - 0x0085D463
+00000000001010111000101110010011 - 0x002B8B93
+00000000101101000110010001100011 - 0x00B46463
+00000000001100000000110000010011 - 0x00300C13
+00000000101101000111010001100011 - 0x00B47463
+00000000010011000000110000010011 - 0x004C0C13
+00000000110000000000110011101111 - 0x00C00CEF
+00000000110000000001101100100011 - 0x00C01B23
+00000000000000000000000001110011 - 0x00000073
+00000000011100000000110100010011 - 0x00700D13
+00000000000011001000110111100111 - 0x000C8DE7
+00000110001100000000110100010011 - 0x06300D13
+*/
@@ -0,0 +1,44 @@
+/* Superscalar pairing - run with --issue-width 2. Independent pairs, a pair split by a dependency, by the
+single DMem port and by a load-use stall, a loop closed by bne and a jal squashing the instruction behind it.
+
+DMem: [0] 10  [4] 3
+*/
+
+0:        lw x1, 0(x0)           // 0x00002083 - R1 = 10
+4:        lw x2, 4(x0)           // 0x00402103 - R2 = 3 - second DMem access, issues alone
+8:        addi x3, x0, 0         // 0x00000193 - R3 = 0
+12:       addi x4, x0, 0         // 0x00000213 - R4 = 0 - independent, pairs with the addi above
+16:  L:   add x4, x4, x2         // 0x00220233 - R4 = R4 + R2
+20:       addi x3, x3, 1         // 0x00118193 - R3 = R3 + 1 - independent, pairs with the add
+24:       xor x5, x4, x3         // 0x003242B3 - R5 = R4 ^ R3 - reads both results, forwarded
+28:       sw x4, 8(x0)           // 0x00402423 - DMem[8] = R4
+32:       sw x3, 12(x0)          // 0x00302623 - DMem[12] = R3 - second DMem access, issues alone
+36:       bne x3, x1, .-20       // 0xFE1196E3 - loop 10 times
+40:       lw x6, 8(x0)           // 0x00802303 - R6 = 30
+44:       add x7, x6, x6         // 0x006303B3 - R7 = 60 - load-use stall
+48:       sw x7, 16(x0)          // 0x00702823 - DMem[16] = R7
+52:       jal x8, .+8            // 0x0080046F - R8 = 56, skips the next instruction
+56:       addi x9, x0, 99        // 0x06300493 - squashed - R9 stays 0
+60:  J:   addi x10, x0, 7        // 0x00700513 - R10 = 7
+64:       HALT                   // 0xFFFFFFFF - HALT
+
+
+/* In Binary
+00000000000000000010000010000011 - 0x00002083
+00000000010000000010000100000011 - 0x00402103
+00000000000000000000000110010011 - 0x00000193
+00000000000000000000001000010011 - 0x00000213
+00000000001000100000001000110011 - 0x00220233
+00000000000100011000000110010011 - 0x00118193
+00000000001100100100001010110011 - 0x003242B3
+00000000010000000010010000100011 - 0x00402423
+00000000001100000010011000100011 - 0x00302623
+11111110000100011001011011100011 - 0xFE1196E3
+00000000100000000010001100000011 - 0x00802303
+00000000011000110000001110110011 - 0x006303B3
+00000000011100000010100000100011 - 0x00702823
+00000000100000000000010001101111 - 0x0080046F
+00000110001100000000010010010011 - 0x06300493
+00000000011100000000010100010011 - 0x00700513
+11111111111111111111111111111111 - 0xFFFFFFFF
+*/
@@ -0,0 +1,36 @@
+/* ALU results forwarded from MEM to the instruction in ID - the producer is two instructions ahead, so it has
+left EX when its consumer decodes. Covers both source registers, store data and a branch operand.
+
+DMem: [0] 0  [4] 0
+*/
+
+0:        addi x1, x0, 5         // 0x00500093 - R1 = 5
+4:        addi x2, x0, 7         // 0x00700113 - R2 = 7
+8:        add x3, x1, x1         // 0x001081B3 - R3 = R1 + R1 = 10 - R1 forwarded from MEM
+12:       addi x4, x0, 3         // 0x00300213 - R4 = 3
+16:       addi x5, x0, 1         // 0x00100293 - R5 = 1
+20:       sw x4, 0(x0)           // 0x00402023 - DMem[0] = R4 = 3 - store data forwarded from MEM
+24:       addi x6, x0, 9         // 0x00900313 - R6 = 9
+28:       addi x7, x0, 0         // 0x00000393 - R7 = 0
+32:       bne x6, x0, .+8        // 0x00031463 - taken - R6 forwarded from MEM
+36:       addi x8, x0, 1         // 0x00100413 - skipped - R8 stays 0
+40:  S:   add x9, x3, x3         // 0x003184B3 - R9 = 20
+44:       sw x9, 4(x0)           // 0x00902223 - DMem[4] = R9 = 20
+48:       HALT                   // 0xFFFFFFFF - HALT
+
+
+/* In Binary
+00000000010100000000000010010011 - 0x00500093
+00000000011100000000000100010011 - 0x00700113
+00000000000100001000000110110011 - 0x001081B3
+00000000001100000000001000010011 - 0x00300213
+00000000000100000000001010010011 - 0x00100293
+00000000010000000010000000100011 - 0x00402023
+00000000100100000000001100010011 - 0x00900313
+00000000000000000000001110010011 - 0x00000393
+00000000000000110001010001100011 - 0x00031463
+00000000000100000000010000010011 - 0x00100413
+00000000001100011000010010110011 - 0x003184B3
+00000000100100000010001000100011 - 0x00902223
+11111111111111111111111111111111 - 0xFFFFFFFF
+*/
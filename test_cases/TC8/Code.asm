@@ -0,0 +1,40 @@
+/* Branches and jalr reading a value loaded by the instruction right ahead - the load is in EX when the branch
+resolves in ID, so the branch stalls a cycle and takes the loaded value from MEM.
+
+DMem: [0] 4  [4] 1  [8] -1  [12] 56
+*/
+
+0:        addi x2, x0, 4         // 0x00400113 - R2 = 4
+4:        lw x1, 0(x0)           // 0x00002083 - R1 = 4
+8:        beq x1, x2, .+8        // 0x00208463 - taken - load-use stall on R1
+12:       addi x3, x0, 1         // 0x00100193 - skipped - R3 stays 0
+16:  T:   lw x4, 4(x0)           // 0x00402203 - R4 = 1
+20:       bne x4, x0, .+8        // 0x00021463 - taken - load-use stall on R4
+24:       addi x5, x0, 1         // 0x00100293 - skipped - R5 stays 0
+28:  U:   lw x6, 8(x0)           // 0x00802303 - R6 = -1
+32:       blt x6, x0, .+8        // 0x00034463 - taken - load-use stall on R6
+36:       addi x7, x0, 1         // 0x00100393 - skipped - R7 stays 0
+40:  V:   addi x8, x0, 2         // 0x00200413 - R8 = 2
+44:       lw x9, 12(x0)          // 0x00C02483 - R9 = 56
+48:       jalr x10, x9, 0        // 0x00048567 - R10 = 52, jumps to 56 - load-use stall on R9
+52:       addi x11, x0, 1        // 0x00100593 - skipped - R11 stays 0
+56:       HALT                   // 0xFFFFFFFF - HALT
+
+
+/* In Binary
+00000000010000000000000100010011 - 0x00400113
+00000000000000000010000010000011 - 0x00002083
+00000000001000001000010001100011 - 0x00208463
+00000000000100000000000110010011 - 0x00100193
+00000000010000000010001000000011 - 0x00402203
+00000000000000100001010001100011 - 0x00021463
+00000000000100000000001010010011 - 0x00100293
+00000000100000000010001100000011 - 0x00802303
+00000000000000110100010001100011 - 0x00034463
+00000000000100000000001110010011 - 0x00100393
+00000000001000000000010000010011 - 0x00200413
+00000000110000000010010010000011 - 0x00C02483
+00000000000001001000010101100111 - 0x00048567
+00000000000100000000010110010011 - 0x00100593
+11111111111111111111111111111111 - 0xFFFFFFFF
+*/